@@ -4,20 +4,45 @@
 
 from os import path
 from pickle import load
+from importlib import import_module
+from . import batch
+from . import cache
+from . import checkpoint
 from . import cli
 from . import compose_pop
 from . import definitions
+from . import discovery
+from . import ensemble
+from . import frames
 from . import misc
+from . import observer
 from . import pathogen
 from . import person
-from . import plot
 from . import population
+from . import rng
 from . import simul
+from . import sink
 from . import spread_simul
+from . import template
+from . import trace
+from . import track
+from . import vaccination
+from .definitions import VERSION as __version__
 
 
 # Load Database
 # Standard Python Definitions
-__all__ = ["__file__", "cli", "compose_pop", "definitions", "misc", "pathogen", "person",
-           "plot", "population", "simul", "spread_simul"]
+__all__ = ["__file__", "batch", "cache", "checkpoint", "cli", "compose_pop",
+           "definitions", "discovery", "ensemble", "frames", "misc",
+           "observer", "pathogen", "person", "plot", "population", "replay",
+           "rng", "simul", "sink", "spread_simul", "sweep", "template",
+           "trace", "track", "vaccination"]
 
+
+def __getattr__(name):
+    '''Modules that need matplotlib, or run as scripts (python -m), are
+    imported only when asked for
+    '''
+    if name in ("plot", "replay", "sweep"):
+        return import_module("." + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
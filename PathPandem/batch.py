@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Replicates of a small population, vectorized along a leading axis'''
+
+
+from numpy import array as nparray
+from numpy import arange as nparange
+from numpy import zeros as npzeros
+from numpy import ones as npones
+from numpy import where as npwhere
+from numpy import round as npround
+from numpy import abs as npabs
+from numpy import any as npany
+from numpy import append as npappend
+from numpy import concatenate as npconcat
+from numpy import unique as npunique
+from numpy import searchsorted as npsearchsorted
+from numpy import bincount as npbincount
+from numpy import lexsort as nplexsort
+from numpy import put_along_axis as npput_along_axis
+from numpy import nonzero as npnonzero
+from numpy import logical_and as npand
+from numpy import maximum as npmaximum
+from numpy import minimum as npminimum
+from numpy import int64 as npint64
+from numpy import float64 as npfloat64
+from .discovery import random_discovery
+from .track import trajectory, SURVEY_COLUMNS
+
+
+class batch_population(object):
+    '''Independent replicates of a composed population
+    Every column carries a leading replicate axis: replicate x person.
+    The dead are masked (alive), not deleted, so that replicates align.
+    Contamination is sparse: sorted flat (replicate, x, y) cell keys.
+    Within a walk step, all carriers deposit before anyone collects.
+    '''
+    def __init__(self, city, replicates: int=1, rng=None)-> None:
+        '''city: composed population, replicated (homes are re-drawn)'''
+        self.replicates = replicates
+        self.pop_size = city.pop_size
+        self.p_max = city.p_max
+        self.serious_health = city.serious_health
+        self.triage = city.triage
+        self.vac_resist = city.vac_resist
+        self.vac_cov = city.vac_cov
+        self.vac_priority = city.vac_priority
+        self.rng = rng or city.rng
+        shape = (replicates, city.pop_size)
+
+        def tile(column, dtype=None):
+            return nparray([column] * replicates, dtype=dtype or column.dtype)
+
+        self.alive: nparray = npones(shape, dtype=bool)
+        self.active: nparray = tile(city.active)
+        self.recovered: nparray = tile(city.recovered)
+        self.susceptible: nparray = tile(city.susceptible, npfloat64)
+        self.health: nparray = tile(city.health, npfloat64)
+        self.support: nparray = tile(city.support)
+        self.support_days: nparray = tile(city.support_days, npint64)
+        self.comorbidity: nparray = tile(city.comorbidity, npfloat64)
+        self.progress: nparray = tile(city.progress, npfloat64)
+        self.move_per_day: nparray = tile(city.move_per_day, npint64)
+        self.rms_v: nparray = tile(city.rms_v, npfloat64)
+        self.strain: nparray = tile(city.strain, npint64)
+        self.vaccinated: nparray = tile(city.vaccinated)
+        self.home: nparray = self.rng.composition.integers(
+            self.p_max, size=shape + (2,))
+        self.infrastructure: nparray = npones(replicates) * city.infrastructure
+        self.n_dead: nparray = npzeros(replicates, dtype=npint64)
+
+        # Strain properties, indexed by strain id, shared by replicates
+        self.strain_cfr = nparray([0.] + [
+            pathy.cfr for pathy in city.strain_types[1:]])
+        self.strain_inf_per_day = nparray([0.] + [
+            pathy.inf_per_day for pathy in city.strain_types[1:]])
+        self.strain_inf_per_exp = nparray([0.] + [
+            pathy.inf_per_exp for pathy in city.strain_types[1:]])
+        self.strain_persistence = nparray([0] + [
+            pathy.persistence for pathy in city.strain_types[1:]],
+                                          dtype=npint64)
+        # Drug effect on each replicate
+        self.drug_cfr: nparray = npones(replicates)
+        self.drug_recov: nparray = npones(replicates)
+
+        # Vaccination queue: rank of each person, head of each replicate
+        self.vac_rank: nparray = None
+        self.vac_head: nparray = npzeros(replicates, dtype=npint64)
+        self.vac_left: nparray = npzeros(replicates)
+        self.vac_on: nparray = npzeros(replicates, dtype=bool)
+
+        # Contamination: sorted cell keys, days left, strain deposited
+        self.contam_key: nparray = nparray([], dtype=npint64)
+        self.contam_left: nparray = nparray([], dtype=npint64)
+        self.contam_strain: nparray = nparray([], dtype=npint64)
+        self._rep: nparray = nparange(replicates)[:, None]
+        return
+
+    def contaminated(self) -> nparray:
+        '''Replicates with any contaminated cell'''
+        return npbincount(self.contam_key // (self.p_max * self.p_max),
+                          minlength=self.replicates) > 0
+
+    def contaminate(self, keys: nparray, left: nparray,
+                    strain: nparray)-> None:
+        '''Deposit on cells, latest deposit on a cell wins'''
+        keys = npconcat((self.contam_key, keys))[::-1]
+        left = npconcat((self.contam_left, left))[::-1]
+        strain = npconcat((self.contam_strain, strain))[::-1]
+        keys, latest = npunique(keys, return_index=True)
+        keep = left[latest] > 0
+        self.contam_key = keys[keep]
+        self.contam_left = left[latest][keep]
+        self.contam_strain = strain[latest][keep]
+        return
+
+    def mutate(self, in_strain: nparray) -> nparray:
+        '''Mutated strains of in_strain'''
+        mutations = 1 + self.rng.mutation.random(
+            size=(in_strain.size, 3)) * 0.02 - 0.01
+        out_strain = self.strain_cfr.size + nparange(in_strain.size)
+        self.strain_cfr = npappend(
+            self.strain_cfr, self.strain_cfr[in_strain] * mutations[:, 0])
+        self.strain_inf_per_day = npappend(
+            self.strain_inf_per_day,
+            self.strain_inf_per_day[in_strain] * mutations[:, 1])
+        self.strain_inf_per_exp = npappend(
+            self.strain_inf_per_exp,
+            self.strain_inf_per_exp[in_strain] * mutations[:, 2])
+        self.strain_persistence = npappend(
+            self.strain_persistence, self.strain_persistence[in_strain])
+        return out_strain
+
+    def expose(self, pos: nparray, moving: nparray)-> None:
+        '''Carriers contaminate their cells, others collect infection'''
+        keys = (self._rep * self.p_max + pos[..., 0]) * self.p_max\
+            + pos[..., 1]
+        # Deposit
+        carrier = npand(moving, self.strain != 0)
+        active = self.active[carrier]
+        strain = self.strain[carrier]
+        self.contaminate(keys[carrier], self.strain_persistence[strain]
+                         * active, strain * active)
+
+        # Collect
+        rep, indiv = npnonzero(npand(moving, self.strain == 0))
+        if not (rep.size and self.contam_key.size):
+            return
+        keys = keys[rep, indiv]
+        found = npsearchsorted(self.contam_key, keys).clip(
+            max=self.contam_key.size - 1)
+        in_strain = npwhere(self.contam_key[found] == keys,
+                            self.contam_strain[found], 0)
+        chance = self.susceptible[rep, indiv]\
+            * self.strain_inf_per_exp[in_strain]
+        infected = npand(in_strain != 0, self.rng.infection.random(
+            size=keys.size) <= chance)
+        rep, indiv, in_strain = rep[infected], indiv[infected],\
+            in_strain[infected]
+        # Rarely, mutate
+        mutated = self.rng.mutation.random(size=rep.size) < 0.0001
+        if npany(mutated):
+            in_strain[mutated] = self.mutate(in_strain[mutated])
+        # Get infected
+        self.active[rep, indiv] = True
+        self.progress[rep, indiv] = 0.000001
+        self.recovered[rep, indiv] = False
+        self.susceptible[rep, indiv] = self.rng.infection.random(
+            size=rep.size) * 0.01
+        self.strain[rep, indiv] = in_strain
+        return
+
+    def random_walk(self, running: nparray)-> None:
+        '''Let all living persons of running replicates walk randomly'''
+        walk_left = self.move_per_day * npand(self.alive, running[:, None])
+        # Every day, people start from home
+        pos = self.home.copy()
+        limit = self.p_max - 1
+        while npany(walk_left > 0):
+            walk_left -= 1
+            moving = walk_left > 0
+            pos += nparray(
+                npround((self.rng.mobility.random(size=pos.shape) * 2 - 1)
+                        * self.rms_v[..., None]) * moving[..., None],
+                dtype=pos.dtype)
+            # Can't jump beyond boundary, so, reflect exploration
+            pos = npwhere(pos > limit, 2 * limit - pos, npabs(pos))
+            self.expose(pos, moving)
+        return
+
+    def triage_dead(self) -> nparray:
+        '''Mask of supported patients that could not get an ICU bed'''
+        beds = self.infrastructure.astype(npint64)
+        if not npany(self.support.sum(axis=1) > beds):
+            return npzeros(self.support.shape, dtype=bool)
+        # Random order breaks ties of every priority rule
+        order = self.rng.progression.random(size=self.support.shape)
+        if self.triage == "severity":
+            order = (order, self.health)
+        elif self.triage == "fcfs":
+            order = (order, -self.support_days)
+        else:
+            order = (order, )
+        # Supported first, in order of priority
+        order = nplexsort(order + (~self.support, ), axis=1)
+        rank = npzeros(order.shape, dtype=npint64)
+        npput_along_axis(rank, order, nparange(order.shape[1])[None, :],
+                         axis=1)
+        return npand(self.support, rank >= beds[:, None])
+
+    def inf_progress(self)-> None:
+        '''progress infection every day'''
+        # Health declines every day
+        self.health -= self.active\
+            * self.rng.progression.random(size=self.health.shape)\
+            * self.strain_cfr[self.strain] * self.drug_cfr[:, None]
+        self.progress += self.rng.progression.random(size=self.health.shape)\
+            * self.active * self.strain_inf_per_day[self.strain]\
+            * self.drug_recov[:, None]
+        self.progress = self.progress.clip(min=0, max=1)
+        self.recovered |= npand(self.progress == 1, self.alive)
+        self.active &= ~self.recovered
+        # If recovered, return to original health
+        self.health = npwhere(self.active, self.health, 1 - self.comorbidity)
+
+        # If health below threshold, life support is essential
+        self.support = npand(self.health < self.serious_health, self.alive)
+        self.support_days = (self.support_days + 1) * self.support
+
+        # Unsupported, or health < 0: death
+        dead = self.triage_dead()
+        dead |= npand(self.health <= 0., self.alive)
+        self.n_dead += dead.sum(axis=1)
+        self.alive &= ~dead
+        for column in (self.active, self.recovered, self.support):
+            column &= self.alive
+
+        # Contamination reduces over time
+        self.contam_left -= 1
+        keep = self.contam_left > 0
+        self.contam_key = self.contam_key[keep]
+        self.contam_left = self.contam_left[keep]
+        self.contam_strain = self.contam_strain[keep]
+
+        # Infrastructure may grow, but linearly and very slow
+        self.infrastructure = npmaximum(npminimum(
+            self.infrastructure + 0.2, self.active.sum(axis=1) / 5),
+                                        self.infrastructure)
+
+        # Vaccination, when available, happens linearly
+        if npany(self.vac_on):
+            self.vaccinate()
+        return
+
+    def start_vaccination(self, replicates: nparray)-> None:
+        '''Vaccine is available in (mask of) replicates'''
+        if self.vac_rank is None:
+            order = (self.rng.vaccination.random(size=self.alive.shape), )
+            if self.vac_priority == "vulnerable":
+                order += (-self.comorbidity, )
+            elif self.vac_priority == "susceptible":
+                order += (-self.susceptible, )
+            order = nplexsort(order, axis=1)
+            self.vac_rank = npzeros(order.shape, dtype=npint64)
+            npput_along_axis(self.vac_rank, order,
+                             nparange(order.shape[1])[None, :], axis=1)
+        self.vac_on |= replicates
+        return
+
+    def vaccinate(self)-> None:
+        '''Dose the next persons in queue, as many as today's budget
+        Doses that reach a dead person are lost
+        '''
+        self.vac_left += self.vac_on * self.vac_cov * self.alive.sum(axis=1)
+        doses = self.vac_left.astype(npint64)
+        self.vac_left -= doses
+        batch = npand(self.vac_rank >= self.vac_head[:, None],
+                      self.vac_rank < (self.vac_head + doses)[:, None])
+        batch &= self.alive
+        self.vac_head += doses
+        self.vaccinated |= batch
+        self.susceptible = npwhere(
+            batch, (self.susceptible - self.vac_resist).clip(min=0),
+            self.susceptible)
+        return
+
+    def survey(self) -> nparray:
+        '''Testing results of each replicate:
+        active, recovered, cases, serious, dead
+        '''
+        num_active = self.active.sum(axis=1)
+        num_recovered = self.recovered.sum(axis=1)
+        num_cases = num_active + num_recovered + self.n_dead
+        num_serious = self.support.sum(axis=1)
+        return nparray((num_active, num_recovered, num_cases, num_serious,
+                        self.n_dead), dtype=npint64).T
+
+    def quiescent(self) -> nparray:
+        '''Replicates where nobody is active (deposits pathogen)'''
+        return ~self.active.any(axis=1)
+
+    def pass_day(self, running: nparray, walking: nparray=None)-> None:
+        '''progress all population and infections
+        walking: replicates that move, default: all running
+        '''
+        if walking is None:
+            walking = running
+        self.random_walk(walking)  # Macro-scale population
+        self.inf_progress()  # Micro-scale: infected individual
+        return
+
+
+class batch_simulation(object):
+    '''Day-by-day simulation of all replicates of a batch_population
+    Policies are those of simulation, applied to each replicate
+    '''
+    def __init__(
+            self, city: batch_population, med_eff: float=0.,
+            med_recov: float=0, vac_res: float=0, vac_cov: float=0.,
+            movement_restrict: int=0, contact_restrict: int=0,
+            lockdown_chunk: int=0, lockdown_panic: int=1, seed_inf: int=0,
+            zero_lock: bool=False, intervention: bool=False,
+            early_action=False, discovery=None, fast_forward: str="exact",
+            max_days: int=None, plateau: int=0, active_below: int=0,
+    )-> None:
+        self.city = city
+        self.med_eff = med_eff
+        self.med_recov = med_recov
+        self.movement_restrict = movement_restrict
+        self.contact_restrict = contact_restrict
+        self.lockdown_chunk = lockdown_chunk
+        self.lockdown_panic = lockdown_panic
+        self.zero_lock = zero_lock
+        self.intervention = intervention
+        self.early_action = early_action
+        self.fast_forward = fast_forward
+        self.max_days = max_days
+        self.plateau = plateau
+        self.active_below = active_below
+        city.vac_resist = vac_res
+        city.vac_cov = vac_cov
+        replicates = city.replicates
+        discovery = discovery or random_discovery()
+        dates = nparray([discovery.dates(city.rng.discovery)
+                         for _ in range(replicates)], dtype=npint64)
+        self.vaccine_discovery_date = dates[:, 0]
+        self.drug_discovery_date = dates[:, 1]
+        self.lockdown: nparray = npzeros(replicates, dtype=npint64)
+        self.next_lockdown: nparray = npones(replicates, dtype=npint64)\
+            * seed_inf * lockdown_panic
+        # Flattened survey rows: day x (replicate, column)
+        self.track = trajectory(columns=replicates * len(SURVEY_COLUMNS))
+        self.lengths: nparray = npzeros(replicates, dtype=npint64)
+        self.finished: nparray = npzeros(replicates, dtype=bool)
+        self.days = 0
+        self.started = False
+        return
+
+    def restrict(self, replicates: nparray, fold: bool=True)-> None:
+        '''Restrict (or relax) movement and contacts of replicates'''
+        if not npany(replicates):
+            return
+        city = self.city
+        if fold:
+            city.rms_v[replicates] //= self.movement_restrict
+            city.move_per_day[replicates] //= self.contact_restrict
+        else:
+            city.rms_v[replicates] *= self.movement_restrict
+            city.move_per_day[replicates] *= self.contact_restrict
+        return
+
+    def intervene(self, running: nparray)-> None:
+        '''Medical discoveries and early action, before the day begins'''
+        city = self.city
+        vaccine = npand(running, self.days == self.vaccine_discovery_date)
+        if npany(vaccine):
+            city.start_vaccination(vaccine)
+        drug = npand(running, self.days == self.drug_discovery_date)
+        city.drug_cfr[drug] *= self.med_eff
+        city.drug_recov[drug] /= self.med_recov
+        if self.early_action:
+            if not self.days:
+                self.restrict(running)
+            elif self.days == self.zero_lock:
+                # End of initial lockdown
+                self.restrict(running, fold=False)
+        return
+
+    def panic(self, args: nparray, running: nparray)-> None:
+        '''Lockdown in response to spread of infection'''
+        if not self.intervention:
+            return
+        start = running & (self.lockdown == 0)\
+            & (args[:, 2] > self.next_lockdown)
+        self.next_lockdown[start] *= self.lockdown_panic
+        # Panic by infection Spread
+        self.lockdown[start] = 1
+        self.restrict(start)
+        self.lockdown[running & (self.lockdown > 0)] += 1
+        # Business as usual
+        stop = running & (self.lockdown > self.lockdown_chunk + 1)
+        self.restrict(stop, fold=False)
+        self.lockdown[stop] = 0
+        return
+
+    def stopping(self) -> nparray:
+        '''Replicates that meet a stop condition of simulation'''
+        stop = npzeros(self.city.replicates, dtype=bool)
+        if self.max_days and self.days >= self.max_days:
+            stop[:] = True
+        if self.plateau and len(self.track) > self.plateau:
+            cases = self.track.rows[:, 2::len(SURVEY_COLUMNS)]
+            stop |= cases[-1] == cases[-1 - self.plateau]
+        stop |= self.city.active.sum(axis=1) < self.active_below
+        return stop
+
+    def step(self) -> nparray:
+        '''Pass a day for running replicates: survey of each replicate,
+        None after all have ended
+        '''
+        if self.finished.all():
+            return None
+        ending = npzeros(self.city.replicates, dtype=bool)
+        running = ~self.finished
+        if not self.started:
+            self.started = True  # IT STARTS!
+        else:
+            # Absent from persons and places
+            ending = npand(~self.city.contaminated() | self.stopping(),
+                           running)
+            running &= ~ending
+            self.intervene(running)
+            self.days += 1
+        args = self.city.survey()
+        self.track.append(args.ravel())
+        self.lengths[~self.finished] = len(self.track)
+        self.finished |= ending
+        if npany(running):
+            walking = running
+            # Walks are vectorized already, "exact" has nothing to skip
+            if self.fast_forward == "aggressive":
+                walking = running & ~self.city.quiescent()
+            self.city.pass_day(running, walking)
+            self.panic(args, running)
+        return args
+
+    def run(self) -> list:
+        '''Step till all replicates end, returns track of each'''
+        while self.step() is not None:
+            pass
+        rows = self.track.rows.reshape(
+            (len(self.track), self.city.replicates, len(SURVEY_COLUMNS)))
+        return [rows[:length, rep] for rep, length in enumerate(self.lengths)]
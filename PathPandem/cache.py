@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Cache of simulation results'''
+
+
+from hashlib import sha256
+from json import dumps, loads
+from os import path, makedirs, environ, replace, remove
+from sqlite3 import connect
+from time import time
+from .compose_pop import compose_homogenous
+from .definitions import VERSION
+from .simul import simulate
+from .track import simul_result, load_result
+
+
+def canonical(obj):
+    '''json-able, stable representation of simulation inputs'''
+    if isinstance(obj, dict):
+        return {str(key): canonical(val) for key, val in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [canonical(val) for val in obj]
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if hasattr(obj, "tolist"):  # numpy
+        return obj.tolist()
+    # Component objects (e.g. discovery schedules) by class and state
+    return {"class": type(obj).__name__, **canonical(vars(obj))}
+
+
+def result_key(compose_kw: dict, simul_kw: dict, seed: int) -> str:
+    '''Hash of compose_homogenous and simulate inputs, seed, version'''
+    inputs = canonical({"compose": compose_kw, "simul": simul_kw,
+                        "seed": seed, "version": VERSION})
+    return sha256(dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+class result_cache(object):
+    '''Results (npz files) in a directory, indexed by sqlite
+    Least recently used results are evicted beyond max_bytes
+    '''
+    def __init__(self, cache_dir: str=None, max_bytes: int=1 << 30)-> None:
+        '''cache_dir: default $XDG_CACHE_HOME/PathPandem'''
+        if cache_dir is None:
+            cache_dir = path.join(environ.get(
+                "XDG_CACHE_HOME", path.join(path.expanduser("~"), ".cache")),
+                                  "PathPandem")
+        makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index = connect(path.join(cache_dir, "index.sqlite"),
+                             timeout=60)
+        with self.index:
+            self.index.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY,"
+                " size INTEGER, created REAL, accessed REAL,"
+                " hits INTEGER, inputs TEXT)")
+        return
+
+    def __contains__(self, key: str) -> bool:
+        return self.index.execute("SELECT 1 FROM results WHERE key = ?",
+                                  (key, )).fetchone() is not None
+
+    def filename(self, key: str) -> str:
+        '''Location of result'''
+        return path.join(self.cache_dir, key + ".npz")
+
+    def get(self, key: str) -> simul_result:
+        '''Cached result, None if absent'''
+        if key not in self:
+            return None
+        try:
+            result = load_result(self.filename(key))
+        except FileNotFoundError:
+            self.forget(key)
+            return None
+        with self.index:
+            self.index.execute("UPDATE results SET accessed = ?,"
+                               " hits = hits + 1 WHERE key = ?",
+                               (time(), key))
+        return result
+
+    def put(self, key: str, result: simul_result, inputs: dict=None)-> None:
+        '''Store result, then evict beyond max_bytes'''
+        filename = self.filename(key)
+        with open(filename + ".part", "wb") as result_h:
+            result.save(result_h)
+        replace(filename + ".part", filename)
+        with self.index:
+            self.index.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, 0, ?)",
+                (key, path.getsize(filename), time(), time(),
+                 dumps(canonical(inputs or {}), sort_keys=True)))
+        self.evict()
+        return
+
+    def forget(self, key: str)-> None:
+        '''Remove a result'''
+        with self.index:
+            self.index.execute("DELETE FROM results WHERE key = ?", (key, ))
+        if path.isfile(self.filename(key)):
+            remove(self.filename(key))
+        return
+
+    def evict(self)-> None:
+        '''Least recently used first, till within max_bytes'''
+        total = self.index.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        lru = self.index.execute(
+            "SELECT key, size FROM results ORDER BY accessed").fetchall()
+        for key, size in lru:
+            if total <= self.max_bytes:
+                break
+            self.forget(key)
+            total -= size
+        return
+
+    def query(self, **match) -> list:
+        '''(key, inputs) of cached results whose inputs match, e.g.
+        query(seed=1), query(compose={"simul_pop": 5000})
+        '''
+        def matches(inputs, match):
+            for name, val in match.items():
+                if isinstance(val, dict):
+                    if not matches(inputs.get(name, {}), val):
+                        return False
+                elif inputs.get(name) != canonical(val):
+                    return False
+            return True
+
+        found = []
+        for key, inputs in self.index.execute(
+                "SELECT key, inputs FROM results ORDER BY accessed DESC"):
+            inputs = loads(inputs)
+            if matches(inputs, match):
+                found.append((key, inputs))
+        return found
+
+    def simulate(self, compose_kw: dict, simul_kw: dict,
+                 seed: int=None) -> simul_result:
+        '''Cached result of composing and simulating, else simulate
+        Unseeded runs are not reproducible, hence, never cached
+        '''
+        if seed is None:
+            city, simul_pop, _, _ = compose_homogenous(**compose_kw)
+            return simulate(city=city, logfile=None, simul_pop=simul_pop,
+                            **simul_kw)
+        key = result_key(compose_kw, simul_kw, seed)
+        result = self.get(key)
+        if result is None:
+            city, simul_pop, _, _ = compose_homogenous(seed=seed,
+                                                       **compose_kw)
+            result = simulate(city=city, logfile=None, simul_pop=simul_pop,
+                              **simul_kw)
+            self.put(key, result, inputs={
+                "compose": compose_kw, "simul": simul_kw, "seed": seed,
+                "version": VERSION})
+        return result
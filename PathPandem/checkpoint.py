@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Checkpoints of a running simulation'''
+
+
+from json import dumps, loads
+from os import replace
+from numpy import array as nparray
+from numpy import int64 as npint64
+from numpy import intp as npintp
+from numpy import savez as npsavez
+from numpy import load as npload
+from numpy.random import SeedSequence
+from .population import population
+from .rng import rng_streams, STREAMS
+from .template import COLUMNS, SCALARS, strain_params, make_strains
+from .track import trajectory
+from .vaccination import vac_scheduler
+
+
+# Arguments of simulation restored from a checkpoint
+PARAMS = ("simul_pop", "med_eff", "med_recov", "vac_res", "vac_cov",
+          "movement_restrict", "contact_restrict", "lockdown_chunk",
+          "lockdown_panic", "zero_lock", "intervention", "early_action",
+          "fast_forward", "max_days", "plateau", "active_below")
+
+# Progress of simulation
+STATE = ("days", "lockdown", "next_lockdown", "started", "finished",
+         "elapsed", "vaccine_discovery_date", "drug_discovery_date",
+         "fast_forwarded")
+
+
+def _plain(value):
+    '''numpy scalars for json'''
+    return value.item()
+
+
+def save_checkpoint(sim, filename: str)-> None:
+    '''Bulk dump of arrays (uncompressed npz) and json of scalars
+    Written to a temporary file first: a crash never corrupts "filename"
+    '''
+    city = sim.city
+    arrays = {"col_" + name: getattr(city, name) for name in COLUMNS}
+    arrays["space_contam"] = city.space_contam
+    arrays["space_dep_strain"] = city.space_dep_strain
+    arrays["cohort_dead"] = city.cohort_dead
+    arrays["strains"] = strain_params(city.strain_types)
+    arrays["track"] = sim.track.rows
+    if city.trace is not None:
+        arrays["depositor"] = city.trace.depositor
+    arrays["lockdowns"] = nparray(
+        [(start, -1 if end is None else end)
+         for start, end in sim.lockdowns], dtype=npint64).reshape((-1, 2))
+    vaccination = None
+    if city.vaccination is not None:
+        arrays["vac_queue"] = city.vaccination.queue[city.vaccination.head:]
+        vaccination = {"vac_resist": city.vaccination.vac_resist,
+                       "vac_cov": city.vaccination.vac_cov,
+                       "doses_left": city.vaccination.doses_left}
+    seed_seq = city.rng.seed_seq
+    meta = {
+        "scalars": {name: getattr(city, name) for name in SCALARS},
+        "cohort_types": city.cohort_types,
+        "vaccination": vaccination,
+        "seed": {"entropy": seed_seq.entropy,
+                 "spawn_key": list(seed_seq.spawn_key),
+                 "n_children_spawned": seed_seq.n_children_spawned},
+        "streams": {name: getattr(city.rng, name).bit_generator.state
+                    for name in STREAMS},
+        "params": {name: getattr(sim, name) for name in PARAMS},
+        "state": {name: getattr(sim, name) for name in STATE},
+    }
+    arrays["meta"] = nparray(dumps(meta, default=_plain))
+    partial = filename + ".part"
+    with open(partial, "wb") as checkpoint_h:
+        npsavez(checkpoint_h, **arrays)
+    replace(partial, filename)
+    return
+
+
+def load_checkpoint(filename: str) -> tuple:
+    '''Population and state (dict) of the simulation in a checkpoint
+    Random streams are restored by restore_state
+    '''
+    with npload(filename) as saved:
+        meta = loads(str(saved["meta"]))
+        city = population(p_max=0, rng=rng_streams(seed_seq=SeedSequence(
+            meta["seed"]["entropy"], spawn_key=meta["seed"]["spawn_key"],
+            n_children_spawned=meta["seed"]["n_children_spawned"])))
+        for name, value in meta["scalars"].items():
+            setattr(city, name, value)
+        for name in COLUMNS:
+            setattr(city, name, saved["col_" + name])
+        city.space_contam = saved["space_contam"]
+        city.space_dep_strain = saved["space_dep_strain"]
+        city.cohort_dead = saved["cohort_dead"]
+        city.cohort_types = meta["cohort_types"]
+        city.strain_types = make_strains(saved["strains"])
+        if meta["vaccination"] is not None:
+            vaccination = vac_scheduler.__new__(vac_scheduler)
+            vars(vaccination).update(meta["vaccination"])
+            vaccination.queue = nparray(saved["vac_queue"], dtype=npintp)
+            vaccination.head = 0
+            city.vaccination = vaccination
+        state = dict(meta["state"], params=meta["params"],
+                     streams=meta["streams"], track=saved["track"],
+                     lockdowns=[(start, None if end < 0 else end) for
+                                start, end in saved["lockdowns"].tolist()],
+                     depositor=(saved["depositor"]
+                                if "depositor" in saved.files else None))
+    return city, state
+
+
+def restore_state(sim, state: dict)-> None:
+    '''Continue sim (simulation of a loaded population) from state'''
+    for name in STATE:
+        if name in state:  # Older checkpoints lack later additions
+            setattr(sim, name, state[name])
+    sim.lockdowns = state["lockdowns"]
+    rows = state["track"]
+    sim.track = trajectory(columns=rows.shape[1],
+                           capacity=max(256, rows.shape[0]))
+    sim.track.buffer[:rows.shape[0]] = rows
+    sim.track.size = rows.shape[0]
+    if sim.city.trace is not None and state["depositor"] is not None:
+        sim.city.trace.depositor = nparray(state["depositor"])
+    # Last, since composing the simulation draws discovery dates
+    for name, stream_state in state["streams"].items():
+        getattr(sim.city.rng, name).bit_generator.state = stream_state
+    return
@@ -20,11 +20,11 @@
 
 
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
-from gooey import Gooey
+from argparse import Namespace
 
-@Gooey
-def cli()-> tuple:
-    '''cli inputs'''
+
+def get_parser() -> ArgumentParser:
+    '''Parser of all simulation parameters'''
     parser: ArgumentParser = ArgumentParser(
         description="Simulate spread of a disease",
         formatter_class=ArgumentDefaultsHelpFormatter
@@ -35,6 +35,15 @@ def cli()-> tuple:
                         help="Community takes early action")
     parser.add_argument("-g", "--graphical-visualization", action='store_true',
                         help="Visualize population movements, very slow")
+    parser.add_argument("--headless", action='store_true',
+                        help="No plots, only log survey")
+    parser.add_argument("--redraw-every", default=1, type=int,
+                        help="Days between redraws of plots")
+    parser.add_argument("--max-fps", default=0, type=float,
+                        help="Redraws of plots per second at most "
+                        "(0: unlimited)")
+    parser.add_argument("--plot-sample", default=2000, type=int,
+                        help="Persons of each kind drawn with -g (0: all)")
     parser.add_argument("-P", "--population", type=int, default=5000,
                         help="Population to simulate, sugest: <50000")
     parser.add_argument(
@@ -84,17 +93,122 @@ def cli()-> tuple:
                         help="% reduction in health deterioration due to virus")
     parser.add_argument("-f", "--fast-recover", default=50, type=float,
                         help="% reduction in days on infection")
-    args = parser.parse_args()
-    return (args.population, args.density, args.infrastructure, args.contacts,
-            args.travel, args.seed_infect, args.feeble_percent/100,
-            args.comorbidity/100, args.resist_percent/100, args.resistance/100,
-            args.case_fatality/100, args.persistence, args.days_per_inf,
-            args.serious_health/100, args.efficiency/100,
-            args.worried_movement_ratio, args.worried_contact_ratio,
-            args.lockdown_chunk, args.lockdown_panic, args.zero_lockdown,
-            args.early_action, args.intermediate_action,
-            args.vaccine_resistance/100, args.vaccine_coverage/100,
-            1 - args.medicine_effect/100, 1 - args.fast_recover/100,
-            args.graphical_visualization,
+    parser.add_argument("-t", "--triage", default="random",
+                        choices=("random", "severity", "fcfs"),
+                        help="Priority of patients for available ICU beds")
+    parser.add_argument("-q", "--vaccine-priority", default="random",
+                        choices=("random", "vulnerable", "susceptible"),
+                        help="Order in which population queues for vaccine")
+    parser.add_argument("--seed", default=None, type=int,
+                        help="Seed random events to reproduce a run")
+    parser.add_argument("--vaccine-day", default=None, type=int,
+                        help="Fix the day of vaccine discovery")
+    parser.add_argument("--drug-day", default=None, type=int,
+                        help="Fix the day of drug discovery")
+    parser.add_argument("--scenario-file", default=None, type=str,
+                        help='json discovery days {"vaccine": d, "drug": d}')
+    parser.add_argument("--fast-forward", default="exact",
+                        choices=("off", "exact", "aggressive"),
+                        help="While nobody is infected, walk without "
+                        "visiting every person (exact: same results) or "
+                        "don't walk (aggressive)")
+    parser.add_argument("--max-days", default=None, type=int,
+                        help="Stop after these many days")
+    parser.add_argument("--plateau", default=0, type=int,
+                        help="Stop when cases don't rise for these many days")
+    parser.add_argument("--active-below", default=0, type=int,
+                        help="Stop when fewer persons are infected")
+    parser.add_argument("--log-format", default="text",
+                        choices=("text", "npz", "parquet"),
+                        help="Format of daily survey log (parquet: pyarrow)")
+    parser.add_argument("--log-flush", default=None, type=int,
+                        help="Days between writes of text and parquet logs "
+                        "(0: at checkpoints and the end), default: 1 for "
+                        "text, 256 for parquet; npz logs are written at "
+                        "checkpoints and the end")
+    parser.add_argument("--log-thread", action='store_true',
+                        help="Write log in a background thread")
+    parser.add_argument("--trace", default=None, type=str,
+                        help="Record infection, support, recovery and death "
+                        "events in this binary file")
+    parser.add_argument("--frames", default=None, type=str,
+                        help="Record daily contamination and positions in "
+                        "this (zip) file, to replay")
+    parser.add_argument("--frame-sample", default=1000, type=int,
+                        help="Persons whose positions are recorded")
+    parser.add_argument("--compare-policies", action='store_true',
+                        help="Uncontrolled, Early_acted and Intervened "
+                        "replicates on common random numbers")
+    parser.add_argument("--replicates", default=1, type=int,
+                        help="Simulate replicates, save mean and quantiles")
+    parser.add_argument("--workers", default=None, type=int,
+                        help="Processes simulating replicates (all CPUs)")
+    parser.add_argument("--batch", default=0, type=int,
+                        help="Replicates vectorized together (small cities)")
+    parser.add_argument("--template", default=None, type=str,
+                        help='Compose replicates\' population once: "memory"'
+                        ' or a directory to save it in (or load it from)')
+    parser.add_argument("--checkpoint", default=None, type=str,
+                        help="Save simulation state here, also on SIGTERM")
+    parser.add_argument("--checkpoint-every", default=0, type=int,
+                        help="Days between checkpoints (0: only on SIGTERM)")
+    parser.add_argument("--resume", default=None, type=str,
+                        help="Continue the simulation saved in a checkpoint")
+    return parser
+
+
+def translate(args: Namespace) -> Namespace:
+    '''Parsed arguments to simulation parameters, named as arguments of
+    compose_homogenous and simulate (percentages as fractions)
+    '''
+    return Namespace(
+        simul_pop=args.population, pop_dense=args.density,
+        infra=args.infrastructure, move_per_day=args.contacts,
+        rms_v=args.travel, seed_inf=args.seed_infect,
+        feeble_prop=args.feeble_percent/100,
+        comorbidity=args.comorbidity/100,
+        resist_prop=args.resist_percent/100,
+        resistance=args.resistance/100, cfr=args.case_fatality/100,
+        persistence=args.persistence, day_per_inf=args.days_per_inf,
+        serious_health=args.serious_health/100,
+        inf_per_exp=args.efficiency/100,
+        movement_restrict=args.worried_movement_ratio,
+        contact_restrict=args.worried_contact_ratio,
+        lockdown_chunk=args.lockdown_chunk,
+        lockdown_panic=args.lockdown_panic, zero_lock=args.zero_lockdown,
+        early_action=args.early_action,
+        intervention=args.intermediate_action,
+        vac_res=args.vaccine_resistance/100,
+        vac_cov=args.vaccine_coverage/100,
+        med_eff=1 - args.medicine_effect/100,
+        med_recov=1 - args.fast_recover/100,
+        visualize=args.graphical_visualization, triage=args.triage,
+        vac_priority=args.vaccine_priority, seed=args.seed,
+        vaccine_day=args.vaccine_day, drug_day=args.drug_day,
+        scenario_file=args.scenario_file, headless=args.headless,
+        replicates=args.replicates, workers=args.workers, batch=args.batch,
+        template=args.template, checkpoint=args.checkpoint,
+        checkpoint_every=args.checkpoint_every, resume=args.resume,
+        fast_forward=args.fast_forward, max_days=args.max_days,
+        plateau=args.plateau, active_below=args.active_below,
+        compare_policies=args.compare_policies, log_format=args.log_format,
+        log_flush=args.log_flush, log_thread=args.log_thread,
+        trace=args.trace, frames=args.frames,
+        frame_sample=args.frame_sample, redraw_every=args.redraw_every,
+        max_fps=args.max_fps, plot_sample=args.plot_sample,
     )
 
+
+def _cli() -> Namespace:
+    '''Parse command line'''
+    return translate(get_parser().parse_args())
+
+
+def cli()-> Namespace:
+    '''cli inputs: Gooey GUI if available, else plain command line'''
+    try:
+        from gooey import Gooey
+    except ImportError:
+        return _cli()
+    return Gooey(_cli)()
+
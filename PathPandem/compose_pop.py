@@ -18,10 +18,10 @@
 # along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
 '''Compose a homogenous population'''
 
-from .cli import cli
 from .pathogen import pathogen
 from .person import person
 from .population import population
+from .rng import rng_streams
 
 def compose_homogenous(
         simul_pop: int=0, pop_dense: float=0., infra: float=0.,
@@ -30,28 +30,37 @@ def compose_homogenous(
         resist_prop: float=0., resistance: float=0., cfr: float=0.,
         day_per_inf: int=0, inf_per_exp: float=0., persistence: int=0,
         vac_res: float=0, vac_cov: float=0, resist_def: float=0,
+        triage: str="random", vac_priority: str="random", seed: int=None,
 ) -> tuple:
-    '''A homogenous population'''
+    '''A homogenous population
+    seed: reproduces the population and all its random events
+    '''
     # INITS
     max_space = int(pow(simul_pop/pop_dense, 0.5))  # Sqr_mtr
     infra *= simul_pop
     feeble_prop = round(feeble_prop * simul_pop)
     resist_prop = round(resist_prop * simul_pop)
     ordinary_prop = simul_pop - feeble_prop - resist_prop- seed_inf
+    rng = rng_streams(seed)
 
     # INIT pathogen, host-type
     pathy = pathogen(cfr=cfr, raw_cfr=True, day_per_inf=day_per_inf,
                      inf_per_exp=inf_per_exp, persistence = persistence)
     ordinary_immun = person(susceptible=1, move_per_day=move_per_day,
-                            rms_v=rms_v, p_max=max_space)
-    feeble = person(parent=ordinary_immun, comorbidity=comorbidity)
-    resest_immun = person(parent=ordinary_immun, susceptible=resist_def)
+                            rms_v=rms_v, p_max=max_space, cohort="ordinary",
+                            rng=rng.composition)
+    feeble = person(parent=ordinary_immun, comorbidity=comorbidity,
+                    cohort="feeble")
+    resest_immun = person(parent=ordinary_immun, susceptible=resist_def,
+                          cohort="resistant")
 
     # Founder of infection
     founder = person(parent=ordinary_immun, active=True,
-                     progress=0.0001, strain=pathy)
+                     progress=0.0001, strain=pathy, cohort="founder")
     city = population(infrastructure=infra, p_max=max_space,
-                      serious_health=serious_health, resist_def=resist_def)
+                      serious_health=serious_health, resist_def=resist_def,
+                      vac_resist=vac_res, vac_cov=vac_cov,
+                      vac_priority=vac_priority, triage=triage, rng=rng)
     city.compose_pop(resest_immun, resist_prop)
     city.compose_pop(ordinary_immun, ordinary_prop)
     city.compose_pop(feeble, feeble_prop)
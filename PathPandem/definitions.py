@@ -20,5 +20,6 @@
 
 
 MED_DISCOVERY = 1/365.25
+VERSION = "1.0.2.3"
 
 
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Schedule of medical discoveries'''
+
+
+from json import load as jsonload
+from .definitions import MED_DISCOVERY
+
+
+class random_discovery(object):
+    '''Each day, a discovery happens with probability "rate"'''
+    def __init__(self, rate: float=MED_DISCOVERY)-> None:
+        self.rate = rate
+        return
+
+    def draw(self, rng) -> int:
+        '''Day of first success of daily Bernoulli trials'''
+        return int(rng.geometric(self.rate))
+
+    def dates(self, rng) -> tuple:
+        '''vaccine discovery date, drug discovery date'''
+        return self.draw(rng), self.draw(rng)
+
+
+class fixed_discovery(random_discovery):
+    '''Discoveries on given days, unknown (None) days are drawn randomly'''
+    def __init__(self, vaccine: int=None, drug: int=None,
+                 rate: float=MED_DISCOVERY)-> None:
+        super().__init__(rate=rate)
+        self.vaccine = vaccine
+        self.drug = drug
+        return
+
+    def dates(self, rng) -> tuple:
+        '''vaccine discovery date, drug discovery date'''
+        vaccine, drug = super().dates(rng)
+        if self.vaccine is not None:
+            vaccine = self.vaccine
+        if self.drug is not None:
+            drug = self.drug
+        return vaccine, drug
+
+
+def scenario_discovery(scenario_file: str,
+                       rate: float=MED_DISCOVERY) -> fixed_discovery:
+    '''Discovery days from a json scenario file:
+    {"vaccine": <day>, "drug": <day>}, missing keys are drawn randomly
+    '''
+    with open(scenario_file, "r") as scenario_h:
+        scenario = jsonload(scenario_h)
+    return fixed_discovery(vaccine=scenario.get("vaccine"),
+                           drug=scenario.get("drug"), rate=rate)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Ensemble of replicate simulations'''
+
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, get_all_start_methods
+from os import path
+from numpy import array as nparray
+from numpy import zeros as npzeros
+from numpy import int64 as npint64
+from numpy import quantile as npquantile
+from numpy import savez_compressed as npsavez
+from numpy.random import SeedSequence
+from .batch import batch_population, batch_simulation
+from .compose_pop import compose_homogenous
+from .cache import result_key
+from .simul import simulate
+from .template import population_template, freeze, load_template
+from .track import SURVEY_COLUMNS
+
+
+# Quantile bands reported by default
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Policies compared by run_policies (named as in spread_simul outputs)
+POLICIES = {
+    "Uncontrolled": {"early_action": False, "intervention": False},
+    "Early_acted": {"early_action": True, "intervention": False},
+    "Intervened": {"early_action": False, "intervention": True},
+}
+
+# Template of this process, shared by jobs (set by the pool initializer)
+_TEMPLATE: population_template = None
+
+
+def run_replicate(compose_kw: dict, simul_kw: dict,
+                  seed: SeedSequence=None,
+                  template: population_template=None) -> nparray:
+    '''Compose a population and simulate it, returns survey track
+    template: clone it instead of composing
+    '''
+    if template is None:
+        city, simul_pop, _, _ = compose_homogenous(seed=seed, **compose_kw)
+    else:
+        city = template.clone(seed)
+        simul_pop = city.pop_size
+    result = simulate(city=city, logfile=None, simul_pop=simul_pop,
+                      **simul_kw)
+    return result.track
+
+
+def run_batch(compose_kw: dict, simul_kw: dict, seed: SeedSequence=None,
+              replicates: int=1,
+              template: population_template=None) -> list:
+    '''Compose a population and simulate its replicates vectorized
+    Returns survey track of each replicate
+    '''
+    if template is None:
+        city, _, _, _ = compose_homogenous(seed=seed, **compose_kw)
+    else:
+        city = template.clone(seed)
+    batch = batch_population(city, replicates=replicates)
+    return batch_simulation(city=batch, **simul_kw).run()
+
+
+def _share_template(template)-> None:
+    '''Pool initializer: population_template (inherited by a forked
+    process, copy-on-write) or directory of a saved template (memory-mapped)
+    '''
+    global _TEMPLATE
+    if isinstance(template, str):
+        template = load_template(template)
+    _TEMPLATE = template
+    return
+
+
+def _run_replicate(job: tuple) -> list:
+    '''Unpack a pickled job for the process pool'''
+    if len(job) == 4:
+        return run_batch(*job, template=_TEMPLATE)
+    return [run_replicate(*job, template=_TEMPLATE)]
+
+
+def build_template(compose_kw: dict, seed: int=None,
+                   directory: str=None) -> population_template:
+    '''Compose a population once and freeze it
+    directory: load the template saved here, else compose and save it
+    '''
+    key = result_key(compose_kw, {}, None)
+    if directory and path.isfile(path.join(directory, "template.json")):
+        template = load_template(directory)
+        if template.key != key:
+            raise ValueError("Template in %s was composed differently"
+                             % directory)
+        return template
+    city, _, _, _ = compose_homogenous(seed=seed, **compose_kw)
+    template = freeze(city, key=key)
+    if directory:
+        template.save(directory)
+    return template
+
+
+def align_tracks(tracks: list) -> nparray:
+    '''Stack tracks of different lengths: replicate x day x column
+    A finished epidemic stays as it ended, so its last row is repeated
+    '''
+    days = max(len(track) for track in tracks)
+    aligned = npzeros((len(tracks), days, len(SURVEY_COLUMNS)),
+                      dtype=npint64)
+    for idx, track in enumerate(tracks):
+        aligned[idx, :len(track)] = track
+        aligned[idx, len(track):] = track[-1]
+    return aligned
+
+
+class ensemble_result(object):
+    '''Daily mean and quantile bands of replicate tracks'''
+    def __init__(self, tracks: list, quantiles: tuple=QUANTILES,
+                 seed: int=None)-> None:
+        aligned = align_tracks(tracks)
+        self.seed = seed  # Entropy; replicate i is spawn_key (i,)
+        self.lengths: nparray = nparray([len(track) for track in tracks])
+        self.quantiles: nparray = nparray(quantiles)
+        self.mean: nparray = aligned.mean(axis=0)  # day x column
+        # quantile x day x column
+        self.bands: nparray = npquantile(aligned, self.quantiles, axis=0)
+        return
+
+    def save(self, filename: str)-> None:
+        '''Single compressed npz file'''
+        npsavez(filename, columns=nparray(SURVEY_COLUMNS), mean=self.mean,
+                bands=self.bands, quantiles=self.quantiles,
+                lengths=self.lengths, seed=nparray(str(self.seed)))
+        return
+
+
+def _jobs(compose_kw: dict, simul_kw: dict, seed_seq: SeedSequence,
+          replicates: int, batch: int=0) -> list:
+    '''Job of each replicate (or batch of replicates), children of seed_seq'''
+    if batch:
+        sizes = [min(batch, replicates - start)
+                 for start in range(0, replicates, batch)]
+        return [(compose_kw, simul_kw, child, size)
+                for child, size in zip(seed_seq.spawn(len(sizes)), sizes)]
+    return [(compose_kw, simul_kw, child)
+            for child in seed_seq.spawn(replicates)]
+
+
+def _run_jobs(jobs: list, workers: int=None, compose_kw: dict=None,
+              seed_seq: SeedSequence=None, template: str=None) -> list:
+    '''Tracks of every job, in order, simulated by "workers" processes'''
+    shared = None
+    if template:
+        # Spawned after jobs, whose seeds remain spawn_key (i,)
+        shared = build_template(
+            compose_kw, seed=seed_seq.spawn(1)[0],
+            directory=None if template == "memory" else template)
+        if template != "memory":
+            shared = template  # Workers memory-map the saved arrays
+    if workers == 1:
+        _share_template(shared)
+        try:
+            tracks = [_run_replicate(job) for job in jobs]
+        finally:
+            _share_template(None)
+    else:
+        # Forked workers share the parent's template without copying it
+        context = get_context("fork") \
+            if "fork" in get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_share_template,
+                                 initargs=(shared, )) as pool:
+            tracks = list(pool.map(_run_replicate, jobs))
+    return tracks
+
+
+def run_ensemble(compose_kw: dict, simul_kw: dict, replicates: int=100,
+                 workers: int=None, seed: int=None,
+                 quantiles: tuple=QUANTILES, batch: int=0,
+                 template: str=None) -> ensemble_result:
+    '''Simulate replicates in a pool of "workers" processes
+    compose_kw: arguments of compose_homogenous (except seed)
+    simul_kw: arguments of simulate (except city, logfile, simul_pop)
+    workers: None uses all processors, 1 runs in this process
+    seed: Every replicate (or batch) gets an independent child of this seed
+    batch: vectorize these many replicates of a population per job,
+    recommended for small populations
+    template: "memory" composes the population once and clones it for
+    every job, a directory also saves it there (or loads it if saved)
+    '''
+    seed_seq = SeedSequence(seed)
+    jobs = _jobs(compose_kw, simul_kw, seed_seq, replicates, batch=batch)
+    tracks = _run_jobs(jobs, workers=workers, compose_kw=compose_kw,
+                       seed_seq=seed_seq, template=template)
+    tracks = [track for job_tracks in tracks for track in job_tracks]
+    return ensemble_result(tracks, quantiles=quantiles,
+                           seed=seed_seq.entropy)
+
+
+class policy_result(object):
+    '''Policies simulated with common random numbers: daily mean and
+    quantile bands of each, and of its paired difference from baseline
+    '''
+    def __init__(self, tracks: dict, quantiles: tuple=QUANTILES,
+                 seed: int=None, baseline: str="Uncontrolled")-> None:
+        '''tracks: policy: replicate tracks, replicates in the same order'''
+        self.seed = seed
+        self.policies: list = list(tracks)
+        self.baseline = baseline
+        self.quantiles: nparray = nparray(quantiles)
+        self.lengths: nparray = nparray(
+            [[len(track) for track in tracks[name]]
+             for name in self.policies])  # policy x replicate
+        # policy x replicate x day x column, on common days
+        aligned = align_tracks(
+            [track for name in self.policies for track in tracks[name]]
+        ).reshape(self.lengths.shape + (-1, len(SURVEY_COLUMNS)))
+        self.mean: nparray = aligned.mean(axis=1)  # policy x day x column
+        # quantile x policy x day x column
+        self.bands: nparray = npquantile(aligned, self.quantiles, axis=1)
+        diff = aligned - aligned[self.policies.index(baseline)]
+        self.diff_mean: nparray = diff.mean(axis=1)
+        self.diff_bands: nparray = npquantile(diff, self.quantiles, axis=1)
+        self.final: nparray = aligned[:, :, -1]  # policy x replicate x column
+        return
+
+    def save(self, filename: str)-> None:
+        '''Single compressed npz file'''
+        npsavez(filename, columns=nparray(SURVEY_COLUMNS),
+                policies=nparray(self.policies),
+                baseline=nparray(self.baseline), mean=self.mean,
+                bands=self.bands, diff_mean=self.diff_mean,
+                diff_bands=self.diff_bands, final=self.final,
+                quantiles=self.quantiles, lengths=self.lengths,
+                seed=nparray(str(self.seed)))
+        return
+
+
+def run_policies(compose_kw: dict, simul_kw: dict, replicates: int=100,
+                 workers: int=None, seed: int=None,
+                 quantiles: tuple=QUANTILES, batch: int=0,
+                 template: str=None, policies: dict=POLICIES,
+                 baseline: str="Uncontrolled") -> policy_result:
+    '''Simulate every policy on each replicate with common random numbers:
+    all policies of a replicate start from the same population and random
+    streams, so that differences between policies are less noisy
+    policies: name: arguments of simulate that override simul_kw
+    Other arguments are those of run_ensemble
+    '''
+    seed_seq = SeedSequence(seed)
+    jobs = [(compose_kw, dict(simul_kw, **policy)) + job[2:]
+            for job in _jobs(compose_kw, simul_kw, seed_seq, replicates,
+                             batch=batch)
+            for policy in policies.values()]
+    tracks = _run_jobs(jobs, workers=workers, compose_kw=compose_kw,
+                       seed_seq=seed_seq, template=template)
+    return policy_result(
+        {name: [track for job_tracks in tracks[idx::len(policies)]
+                for track in job_tracks]
+         for idx, name in enumerate(policies)},
+        quantiles=quantiles, seed=seed_seq.entropy, baseline=baseline)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Recorder of daily spatial frames'''
+
+
+from io import BytesIO
+from json import dumps, loads
+from os import path, replace
+from zipfile import ZipFile, ZIP_STORED
+from numpy import array as nparray
+from numpy import concatenate as npconcatenate
+from numpy import cumsum as npcumsum
+from numpy import flatnonzero as npflatnonzero
+from numpy import int16 as npint16
+from numpy import int32 as npint32
+from numpy import int64 as npint64
+from numpy import isin as npisin
+from numpy import load as npload
+from numpy import savez_compressed as npsavez
+from numpy import zeros as npzeros
+
+
+# Host kinds of sampled persons, as in the live plot
+HOSTS = ("susceptible", "active", "resistant")
+# Arrays of a chunk: frames concatenated, with "<key>_count" per frame
+FRAME_KEYS = ("cells", "contam", "strain", "uid", "pos", "host")
+
+
+def predict(contam, strain) -> tuple:
+    '''Next day's grids if nobody deposits pathogen (only decay)'''
+    contam = (contam - 1).clip(min=0)
+    return contam, strain * (contam > 0)
+
+
+def block_max(grid: nparray, factor: int) -> nparray:
+    '''Grid shrunk "factor" fold, each cell is the maximum of its block'''
+    if factor <= 1:
+        return grid
+    rows, cols = (-(-size // factor) * factor for size in grid.shape)
+    padded = npzeros((rows, cols), dtype=grid.dtype)
+    padded[:grid.shape[0], :grid.shape[1]] = grid
+    return padded.reshape(rows // factor, factor,
+                          cols // factor, factor).max(axis=(1, 3))
+
+
+class frame_recorder(object):
+    '''Contamination, deposited strain and positions of sampled persons at
+    the end of each day, in compressed chunks of a zip file
+    Grids are delta encoded: only cells that differ from the previous
+    frame's decay (i.e. fresh deposits) are stored, the first frame of
+    each chunk is relative to a clean grid
+    '''
+    def __init__(self, filename: str, sample: int=1000,
+                 chunk: int=32, resume_day: int=None)-> None:
+        '''sample: persons (at most) whose positions are recorded
+        chunk: days per compressed chunk
+        resume_day: continue the recording of a simulation resumed on this
+        day (with its sample), frames of later days are dropped
+        '''
+        self.filename = filename
+        self.resume_day = resume_day
+        self.sample = sample
+        self.chunk = chunk
+        self.chunks: int = 0  # Chunks written
+        self.frames: list = []  # Frames of the current chunk
+        self.contam: nparray = None  # Grids of the last frame
+        self.strain: nparray = None
+        self.sampled: nparray = nparray([], dtype=npint64)  # uids
+        return
+
+    def attach(self, city)-> None:
+        '''Record city: sample persons evenly, start the file
+        (or continue it, if resumed)
+        '''
+        self.contam = npzeros((city.p_max, city.p_max), dtype=npint16)
+        self.strain = npzeros((city.p_max, city.p_max), dtype=npint32)
+        if self.resume_day is not None and path.isfile(self.filename):
+            self.sampled = nparray(read_meta(self.filename)["sampled"],
+                                   dtype=npint64)
+            self.trim(self.resume_day)
+            return
+        step = max(1, -(-city.pop_size // self.sample)) if self.sample else 0
+        self.sampled = city.uid[::step].copy() if step else self.sampled
+        with ZipFile(self.filename, "w", compression=ZIP_STORED) as frames_h:
+            frames_h.writestr("meta.json", dumps({
+                "p_max": city.p_max, "chunk": self.chunk,
+                "hosts": HOSTS, "sampled": self.sampled.tolist(),
+                "persistence": max([0] + [pathy.persistence for pathy
+                                          in city.strain_types[1:]]),
+            }))
+        return
+
+    def record(self, day: int, city)-> None:
+        '''Frame of the day that passed'''
+        if not len(self.frames):
+            # Chunk begins from clean grids, to be decoded by itself
+            self.contam[:] = 0
+            self.strain[:] = 0
+        contam, strain = predict(self.contam, self.strain)
+        cells = npflatnonzero((city.space_contam != contam)
+                              | (city.space_dep_strain != strain))
+        self.contam[:] = city.space_contam
+        self.strain[:] = city.space_dep_strain
+        alive = npisin(city.uid, self.sampled)
+        pos = city.home if city.last_pos is None else city.last_pos
+        self.frames.append({
+            "cells": cells,
+            "contam": self.contam.ravel()[cells],
+            "strain": self.strain.ravel()[cells],
+            "uid": city.uid[alive],
+            "pos": nparray(pos[alive], dtype=npint32),
+            "host": city.host_kind()[alive],
+            "day": day,
+        })
+        if len(self.frames) == self.chunk:
+            self.flush()
+        return
+
+    def flush(self)-> None:
+        '''Compress frames of the chunk, append them to the file'''
+        if not self.frames:
+            return
+        arrays = {"day": nparray([frame["day"] for frame in self.frames],
+                                 dtype=npint64)}
+        for key in FRAME_KEYS:
+            arrays[key] = npconcatenate([frame[key] for frame in self.frames])
+            arrays[key + "_count"] = nparray(
+                [len(frame[key]) for frame in self.frames], dtype=npint64)
+        with ZipFile(self.filename, "a", compression=ZIP_STORED) as frames_h:
+            self._write_chunk(frames_h, arrays)
+        self.frames = []
+        return
+
+    def _write_chunk(self, frames_h: ZipFile, arrays: dict)-> None:
+        '''Compress the next chunk into the open zip'''
+        chunk_h = BytesIO()
+        npsavez(chunk_h, **arrays)
+        frames_h.writestr("chunk_%06d.npz" % self.chunks, chunk_h.getvalue())
+        self.chunks += 1
+        return
+
+    def trim(self, day: int)-> None:
+        '''Keep frames till "day" (of a checkpoint), rewriting the file'''
+        partial = self.filename + ".part"
+        self.chunks = 0
+        with ZipFile(self.filename, "r") as old_h,\
+             ZipFile(partial, "w", compression=ZIP_STORED) as frames_h:
+            frames_h.writestr("meta.json", old_h.read("meta.json"))
+            for name in chunk_names(self.filename):
+                with npload(BytesIO(old_h.read(name))) as chunk:
+                    arrays = {key: chunk[key] for key in chunk.files}
+                kept = int((arrays["day"] <= day).sum())  # Days ascend
+                if not kept:
+                    break
+                arrays["day"] = arrays["day"][:kept]
+                for key in FRAME_KEYS:
+                    counts = arrays[key + "_count"][:kept]
+                    arrays[key] = arrays[key][:int(counts.sum())]
+                    arrays[key + "_count"] = counts
+                self._write_chunk(frames_h, arrays)
+        replace(partial, self.filename)
+        return
+
+    def close(self)-> None:
+        '''Write the last (partial) chunk'''
+        self.flush()
+        return
+
+
+def read_meta(filename: str) -> dict:
+    '''p_max, chunk, hosts, sampled uids and persistence of a recording'''
+    with ZipFile(filename, "r") as frames_h:
+        return loads(frames_h.read("meta.json"))
+
+
+def chunk_names(filename: str) -> list:
+    '''Chunks of a recording, in order of days'''
+    with ZipFile(filename, "r") as frames_h:
+        return sorted(name for name in frames_h.namelist()
+                      if name.startswith("chunk_"))
+
+
+def read_chunk(filename: str, name: str, p_max: int):
+    '''Decoded frames of a chunk: dict of day, contam and strain grids
+    (copies), uid, pos and host index (HOSTS) of sampled persons
+    '''
+    with ZipFile(filename, "r") as frames_h:
+        with npload(BytesIO(frames_h.read(name))) as chunk:
+            arrays = {key: chunk[key] for key in chunk.files}
+    bounds = {key: npconcatenate(([0], npcumsum(arrays[key + "_count"])))
+              for key in ("cells", "uid")}
+    contam = npzeros((p_max, p_max), dtype=npint16)
+    strain = npzeros((p_max, p_max), dtype=npint32)
+    for idx, day in enumerate(arrays["day"].tolist()):
+        contam, strain = predict(contam, strain)
+        start, end = bounds["cells"][idx:idx + 2]
+        cells = arrays["cells"][start:end]
+        contam.ravel()[cells] = arrays["contam"][start:end]
+        strain.ravel()[cells] = arrays["strain"][start:end]
+        start, end = bounds["uid"][idx:idx + 2]
+        yield {"day": day, "contam": contam.copy(), "strain": strain.copy(),
+               "uid": arrays["uid"][start:end],
+               "pos": arrays["pos"][start:end],
+               "host": arrays["host"][start:end]}
+    return
+
+
+def read_frames(filename: str):
+    '''Decoded frames of all chunks (see read_chunk)'''
+    p_max = read_meta(filename)["p_max"]
+    for name in chunk_names(filename):
+        yield from read_chunk(filename, name, p_max)
+    return
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Observe simulation'''
+
+
+# Colours of tracked lines and of hosts, shared by displays
+LINETYPES = {"Active": "#7F7FFF",
+             "Recovered": "#7FFF7F",
+             "Cases": "#FFFF7F",
+             "Serious": "#FF7F7F",
+             "Dead": "#FFFFFF",
+             "New cases": "#7F7F3F"}
+DOTTYPES = {"Uninfected": "#3F3F3FFF",
+            "Infected": "#0000FFFF",
+            "Resistant": "#3FFF3FFF"}
+
+class observer(object):
+    '''Null sink of simulation updates: headless runs
+    Visualizations (plot_wrap) override what they display
+    '''
+    contam_dots = None  # Set if contamination is to be displayed
+
+    def update_epidem(self, days: int, updates: tuple, newsboard: list,
+                      lockdown: int=0, zero_lock: bool=False,
+                      early_action: bool=False, intervention: bool=False,
+                      vaccined: bool=False, drugged: bool=False) -> None:
+        '''Day's survey'''
+        return
+
+    def update_contam(self, pos, kind, contam) -> None:
+        '''Positions of hosts, their kind (index of frames.HOSTS) and
+        contamination grid (x, y)
+        '''
+        return
+
+    def savefig(self, filehandle)-> None:
+        '''Nothing to save'''
+        return
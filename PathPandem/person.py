@@ -18,7 +18,7 @@
 # along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
 '''Class'''
 
-from numpy.random import randint
+from numpy.random import default_rng
 
 
 class person(object):
@@ -28,8 +28,10 @@ class person(object):
             susceptible: float=None, support = False, health: float=None,
             comorbidity: float=0., progress: float=0., move_per_day: int=0,
             strain: int=None, home: tuple=(0, 0), p_max: int=0,
-            rms_v: float=0)-> None:
-        '''Initialize a (Null) Person'''
+            rms_v: float=0, cohort: str=None, rng=None)-> None:
+        '''Initialize a (Null) Person
+        rng: numpy Generator that places home
+        '''
         self.p_max = p_max  # Maximum walking reach (y)
         self.move_per_day = move_per_day  # Random walk edge length
         self.rms_v = rms_v * 1.4142  # Number of random walk vertices per day
@@ -41,11 +43,13 @@ class person(object):
         self.strain: int = strain  # Pathogen Strain
         self.comorbidity: float = comorbidity  # Predisposed complications
         self.support: bool = support  # On life support
+        self.cohort: str = cohort  # Tag for grouped statistics
         if not(self.p_max):
             self.home = (0, 0)
         else:
             # everyone's init position is uniformly randomly guessed
-            self.home = (randint(self.p_max), randint(self.p_max))
+            rng = rng or default_rng()
+            self.home = tuple(rng.integers(self.p_max, size=2).tolist())
         if parent:  # To copy attribures, NOT the biological reproduction
             self.active = self.active or parent.active
             self.recovered = self.recovered or parent.recovered
@@ -56,6 +60,7 @@ class person(object):
             self.p_max = self.p_max or parent.p_max
             self.comorbidity = self.comorbidity or parent.comorbidity
             self.support = self.support or parent.support
+            self.cohort = self.cohort or parent.cohort
             if susceptible == None:
                 self.susceptible: float = parent.susceptible
             else:
@@ -75,7 +80,7 @@ class person(object):
                 self.health: float = health
         return
 
-    def __copy__(self):
+    def __copy__(self, rng=None):
         '''instance copy'''
-        return person(parent=self)
+        return person(parent=self, rng=rng)
 
@@ -19,34 +19,66 @@
 '''Visualization'''
 
 
-from time import sleep
-from numpy import append as npappend
+from time import sleep, perf_counter
+from numpy import array as nparray
+from numpy import zeros as npzeros
+from numpy.random import default_rng
 from matplotlib import pyplot as plt
 from matplotlib.widgets import CheckButtons as mplCheckButtons
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.patches import Patch
+from .observer import observer, LINETYPES, DOTTYPES
+from .track import trajectory
+from .frames import block_max
 
 
-class plot_wrap():
+# Fresher contamination is more opaque, clean space is transparent
+CONTAM_CMAP = LinearSegmentedColormap.from_list(
+    "contamination", ["#FF3F3F00", "#FF3F3F7F"])
+
+
+class plot_wrap(observer):
     '''Share variables between axes'''
-    def __init__(self, space, persistence, pop_size, visualize=False)-> None:
-        '''Initiate matplot'''
-        self.linetypes = {"Active": "#7F7FFF",
-                         "Recovered": "#7FFF7F",
-                         "Cases": "#FFFF7F",
-                         "Serious": "#FF7F7F",
-                         "Dead": "#FFFFFF",
-                         "New cases": "#7F7F3F"}
-        self.dottypes = {"Uninfected": "#3F3F3FFF",
-                         "Infected": "#0000FFFF",
-                         "Resistant": "#3FFF3FFF"}
+    def __init__(self, space, persistence, pop_size, visualize=False,
+                 redraw_every: int=1, max_fps: float=0,
+                 blit: bool=True, max_pixels: int=None,
+                 sample: int=2000, seed: int=None)-> None:
+        '''Initiate matplot
+        redraw_every: days between redraws of epidemic curves,
+        max_fps: redraws per second at most (0: unlimited),
+        blit: redraw only changing artists over a cached background,
+        if the backend supports it,
+        max_pixels: larger contamination grids are shrunk (block maxima),
+        default: width of its axes in pixels,
+        sample: persons of each kind drawn at most (0: all),
+        seed: seed of the drawn order (default: fixed)
+        '''
+        self.linetypes = dict(LINETYPES)
+        self.dottypes = dict(DOTTYPES)
         self.plt = plt
         self.pop_size = pop_size
         self.fig, self.ax = self.plt.subplots(nrows=1, ncols=(visualize + 1))
         self.plt.subplots_adjust(left=0.2)
         self.fig.set_facecolor("#CFCFCFFF")
+        self.blit = blit and self.fig.canvas.supports_blit
+        self.background = None  # Figure without changing artists
+        self.bgcolor = None
         self.epidem_ax = None
         self.lines = None
         self.contam_dots = None
         self.contam_ax = None
+        # Day and value of each line, lines are drawn from views of it
+        self.series = trajectory(columns=len(self.linetypes) + 1)
+        self.peak = 1
+        self.redraw_every = max(1, redraw_every)
+        self.min_interval = 1 / max_fps if max_fps else 0
+        self.drawn_day = None
+        self.drawn_at = 0.
+        # Drawn persons: first of each kind in a random order of all
+        self.sample = sample
+        self.order = None
+        # Same persons are drawn in reruns of a seed, even unseeded ones
+        self.order_rng = default_rng(0 if seed is None else seed)
         self.track_cb_ax = self.plt.axes([0.05, 0.5, 0.1, 0.4],
                                          facecolor="#00000000")
         self.track_cb_ax.text(
@@ -62,7 +94,7 @@ class plot_wrap():
         if visualize:
             self.epidem_ax = self.ax[0]
             self.contam_ax = self.ax[1]
-            self.init_contam(space, persistence)
+            self.init_contam(space, persistence, max_pixels)
             self.person_cb_ax = self.plt.axes([0.05, 0.25, 0.1, 0.25],
                                              facecolor="#00000000")
             self.person_cb_ax.text(
@@ -93,6 +125,9 @@ class plot_wrap():
         else:
             self.epidem_ax = self.ax
         self.init_epidem()
+        for artist in self.changing():
+            artist.set_animated(self.blit)
+        self.fig.canvas.mpl_connect("draw_event", self.on_draw)
         self.plt.ion()
         self.plt.show(block=False)
         return
@@ -118,29 +153,28 @@ class plot_wrap():
         return
 
 
-    def init_contam(self, space, persistence):
+    def init_contam(self, space, persistence, max_pixels=None):
         '''Initiate space-contamination visualization'''
         hosts = []
         for typ in self.dottypes:
             hosts.append(self.contam_ax.scatter(
                 [], [] , s=1, c=self.dottypes[typ] , label=typ)
             )
-        pathns = []
-        for persist in range(persistence):
-            colstr = "#FF3F3F" + hex(
-                int(0x7F * (1 - persist/persistence)))[2:]
-            if not persist:
-                pathns.append(self.contam_ax.scatter(
-                    [], [], s=1, c=colstr, label="Contaminated space")
-                )
-            else:
-                pathns.append(self.contam_ax.scatter(
-                    [], [], s=1, c=colstr)
-                )
+        # Contamination raster, a grid cell per pixel at most
+        max_pixels = max_pixels or max(1, int(
+            self.contam_ax.get_window_extent().width))
+        self.factor = -(-space // max_pixels)
+        cells = -(-space // self.factor)
+        pathns = self.contam_ax.imshow(
+            npzeros((cells, cells)), origin="lower", cmap=CONTAM_CMAP,
+            vmin=0, vmax=max(1, persistence), interpolation="nearest",
+            extent=(0, cells * self.factor, 0, cells * self.factor))
         self.contam_ax.set_xlim(0, space)
         self.contam_ax.set_ylim(0, space)
         self.contam_ax.set_aspect(1)
         self.contam_ax.legend(
+            handles=hosts + [Patch(color="#FF3F3F7F",
+                                   label="Contaminated space")],
             loc='lower left', bbox_to_anchor= (0.0, 1.01), ncol=2,
             borderaxespad=0, frameon=False)
         self.contam_ax.set_facecolor("#000000")
@@ -158,20 +192,11 @@ class plot_wrap():
                       vaccined: bool=False, drugged: bool=False) -> None:
         '''Update'''
         if len(updates) == 5:
-            for idx, val in enumerate(updates):
-                x, y = self.lines[idx].get_data()
-                x = npappend(x, days)
-                y = npappend(y, val)
-                self.lines[idx].set_data((x, y))
-            day, cases = self.lines[2].get_data()
-            if len(day) == 1:
-                new_cases = 0
-            else:
-                new_cases = cases[-1] - cases[-2]
-            x, y = self.lines[5].get_data()
-            x = npappend(x, days)
-            y = npappend(y, new_cases)
-            self.lines[5].set_data((x, y))
+            cases = updates[2]
+            new_cases = (cases - self.series.rows[-1, 3]
+                         if len(self.series) else 0)
+            self.series.append((days, *updates, new_cases))
+            self.peak = max(self.peak, *updates, new_cases)
             for idx, news in enumerate(newsboard):
                 if idx < len(self.news_text):
                     self.news_text[idx].set_text(news)
@@ -182,12 +207,10 @@ class plot_wrap():
                         horizontalalignment='left',
                         transform=self.epidem_ax.transAxes,
                         fontweight='bold',
-                        color="#BF7F7FFF"
+                        color="#BF7F7FFF",
+                        animated=self.blit
                     ))
             bgcolor = 0
-            label_on = self.track_cb.get_status()
-            for idx in range(len(self.lines)):
-                self.lines[idx].set_visible(label_on[idx])
             if lockdown or (days < zero_lock and early_action):
                 bgcolor += 0x3F0000
             elif intervention or early_action:
@@ -197,26 +220,106 @@ class plot_wrap():
             if drugged:
                 bgcolor += 0x3F
             bgcolor = "#" + "0" * (6 - len(hex(bgcolor)[2:])) + hex(bgcolor)[2:]
-            self.epidem_ax.set_facecolor(bgcolor)
+            if bgcolor != self.bgcolor:
+                # Background changes: whole figure is redrawn
+                self.bgcolor = bgcolor
+                self.epidem_ax.set_facecolor(bgcolor)
+            if self.due(days):
+                self.draw_epidem()
+                self.render()
+            else:
+                self.fig.canvas.flush_events()
+        return
+
+    def due(self, days: int) -> bool:
+        '''Redraw policy: every redraw_every days, at most max_fps'''
+        if self.drawn_day is not None\
+           and days - self.drawn_day < self.redraw_every:
+            return False
+        now = perf_counter()
+        if now - self.drawn_at < self.min_interval:
+            return False
+        self.drawn_day, self.drawn_at = days, now
+        return True
+
+    def draw_epidem(self, growth: float=1.25)-> None:
+        '''Point lines to the series, fit axes to them
+        growth: axes outgrown by lines are extended by this factor, so
+        that the static background (ticks) rarely needs a redraw
+        '''
+        rows = self.series.rows
+        if not len(rows):
+            return
+        label_on = self.track_cb.get_status()
+        for idx, line in enumerate(self.lines):
+            line.set_data(rows[:, 0], rows[:, idx + 1])
+            line.set_visible(label_on[idx])
+        start, end = rows[0, 0], rows[-1, 0]
+        xlim, ylim = self.epidem_ax.get_xlim(), self.epidem_ax.get_ylim()
+        if growth == 1 or xlim[0] != start or end > xlim[1]:
+            self.epidem_ax.set_xlim(start,
+                                    start + max(1, growth * (end - start)))
+        if growth == 1 or self.peak * 1.05 > ylim[1]:
+            self.epidem_ax.set_ylim(-0.05 * self.peak,
+                                    1.05 * growth * self.peak)
+        return
+
+    def changing(self) -> list:
+        '''Artists that change every update, drawn over the background'''
+        artists = self.lines + self.news_text
+        if self.contam_dots:
+            hosts, pathns = self.contam_dots
+            artists += [pathns] + hosts
+        return artists
+
+    def on_draw(self, event)-> None:
+        '''Full draw: cache background, draw changing artists over it'''
+        if not self.blit:
+            return
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.changing():
+            self.fig.draw_artist(artist)
+        return
+
+    def render(self)-> None:
+        '''Blit changing artists, or redraw whole figure if its background
+        is stale (axes limits, colour, widgets) or blitting is unsupported
+        '''
+        if not self.blit or self.background is None or self.fig.stale:
             self.mypause(0.0005)
-            self.epidem_ax.relim();
-            self.epidem_ax.autoscale_view(True, True, True)
+            return
+        canvas = self.fig.canvas
+        canvas.restore_region(self.background)
+        for artist in self.changing():
+            self.fig.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
         return
 
 
-    def update_contam(self, host_types: list, pathn_pers: list) -> None:
+    def update_contam(self, pos: nparray, kind: nparray,
+                      contam: nparray) -> None:
         '''Update'''
+        now = perf_counter()
+        if now - self.drawn_at < self.min_interval:
+            self.fig.canvas.flush_events()
+            return
+        self.drawn_at = now
         label_on = self.person_cb.get_status()
-        host_scs, pathn_scs = self.contam_dots
-        for idx, persist in enumerate(pathn_scs):
-            pathn = list(zip(*pathn_pers[idx]))
-            if pathn:
-                persist.set_offsets(pathn)
-            self.contam_dots[1][idx].set_visible(self.contam_cb.get_status()[0])
+        host_scs, pathn_sc = self.contam_dots
+        pathn_sc.set_data(block_max(contam, self.factor).T)
+        pathn_sc.set_visible(self.contam_cb.get_status()[0])
+        if self.order is None or len(self.order) != len(kind):
+            # Population changed, draw another sample
+            self.order = self.order_rng.permutation(len(kind))
+        ordered_kind = kind[self.order]
         for idx, typ in enumerate(host_scs):
-            typ.set_offsets(host_types[idx])
-            self.contam_dots[0][idx].set_visible(label_on[idx])
-        self.mypause(0.0005)
+            members = self.order[ordered_kind == idx]
+            if self.sample:
+                members = members[:self.sample]
+            typ.set_offsets(pos[members])
+            typ.set_visible(label_on[idx])
+        self.render()
         return
 
     def mypause(self, interval):
@@ -234,5 +337,6 @@ class plot_wrap():
 
     def savefig(self, filehandle):
         '''Save figure'''
+        self.draw_epidem(growth=1)
         self.plt.savefig(filehandle)
         return
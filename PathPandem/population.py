@@ -19,23 +19,30 @@
 '''Class'''
 
 
-from random import shuffle
 from numpy import round as npround
 from numpy import array as nparray
 from numpy import float16 as npfloat64
 from numpy import intp as npintp
+from numpy import uint8 as npuint8
+from numpy import bincount as npbincount
 from numpy import int16 as npint64
 from numpy import append as npappend
 from numpy import delete as npdelete
-from numpy import random as nprandom
 from numpy import logical_not as npnot
 from numpy import logical_and as npand
 from numpy import logical_or as npor
 from numpy import nonzero as npnonzero
 from numpy import any as npany
 from numpy import abs as npabs
+from numpy import zeros as npzeros
+from numpy import count_nonzero as npcount_nonzero
+from numpy import arange as nparange
+from numpy import longlong as nplonglong
 from .pathogen import pathogen
 from .person import person
+from .rng import rng_streams
+from .trace import INFECTION, MUTATION, SUPPORT, RECOVERY, DEATH
+from .vaccination import vac_scheduler
 
 
 class population(object):
@@ -43,32 +50,56 @@ class population(object):
     def __init__(
             self, people: list=[], infrastructure: float=0, pop_size: int=0,
             p_max: int=10000, serious_health: float=0.3, resist_def: float=0,
-            vac_resist: float=0, vac_cov: float=0,
+            vac_resist: float=0, vac_cov: float=0, triage: str="random",
+            vac_priority: str="random", debug: bool=False,
+            rng: rng_streams=None,
     )-> None:
         self.pop_size = pop_size  # Intermixing Population size
         self.p_max = p_max  # Geographical boundary (x)
         self.serious_health = serious_health  # Life support threshold
         self.resist_def = resist_def # Susceptibility below means resistant
         self.strain_types: list = [None]  # To track evolution of pathogen
+        self.cohort_types: list = [None]  # Tags of composed sub-populations
         self.infrastructure: float = infrastructure  # Available beds
         self.vac_resist = vac_resist
         self.vac_cov = vac_cov
+        self.vac_priority = vac_priority
+        self.vaccination = None  # Scheduler, once vaccine is available
+        self.trace = None  # event_trace, if events are recorded
+        # ICU bed priority: "random", "severity" or "fcfs"
+        self.triage = triage
+        self.rng = rng or rng_streams()  # Random streams
+
+        # Survey counters, updated wherever a person changes state
+        self.n_active: int = 0
+        self.n_recovered: int = 0
+        self.n_serious: int = 0
+        self.n_dead: int = 0
+        self.cohort_dead: nparray = nparray([0], dtype=npintp)
+        self.debug = debug  # Cross-check counters against arrays
 
         # Use fast numpy ufunc operations on arrays (may be ported to cupy)
         self.active: nparray = nparray([False] * pop_size, dtype=bool)
         self.recovered: nparray = nparray([False] * pop_size, dtype=bool)
         self.susceptible: nparray = nparray([1.] * pop_size, dtype=npfloat64)
+        self.vaccinated: nparray = nparray([False] * pop_size, dtype=bool)
         self.health: nparray = nparray([1.] * pop_size, dtype=npfloat64)
         self.support: nparray = nparray([False] * pop_size, dtype=bool)
+        self.support_days: nparray = nparray([0] * pop_size, dtype=npint64)
         self.comorbidity: nparray = nparray([0.] * pop_size, dtype=npfloat64)
         self.progress: nparray = nparray([0.] * pop_size, dtype=npfloat64)
         self.move_per_day: nparray = nparray([], dtype=npint64)
         self.strain: nparray = nparray([0] * pop_size, dtype=npintp)
+        self.cohort: nparray = nparray([0] * pop_size, dtype=npuint8)
         self.home: nparray = nparray([[0, 0]] * pop_size,
                                     dtype=npint64).reshape((pop_size, 2))
         self.rms_v: nparray = nparray([0] * pop_size, dtype=npint64)
         self.cfr: nparray = nparray([0] * pop_size, dtype=npfloat64)
         self.inf_per_day: nparray = nparray([0] * pop_size, dtype=npfloat64)
+        # Persistent identity, indices shift as the dead are removed
+        self.uid: nparray = nparange(pop_size, dtype=nplonglong)
+        self.next_uid: int = pop_size
+        self.last_pos: nparray = None  # Where last walk ended, None: at home
 
         # Contamination: presence of pathogen in space cell
         # Contamination persists for "int" number of days
@@ -82,13 +113,18 @@ class population(object):
     def __add__(self, indiv: person):
         '''add individuals in population'''
         self.pop_size += 1
+        self.n_active += bool(indiv.active)
+        self.n_recovered += bool(indiv.recovered)
+        self.n_serious += bool(indiv.support)
 
         # Append numpy arrays
         self.active = npappend(self.active, indiv.active)
         self.recovered = npappend(self.recovered, indiv.recovered)
         self.susceptible = npappend(self.susceptible, indiv.susceptible)
+        self.vaccinated = npappend(self.vaccinated, False)
         self.health = npappend(self.health, indiv.health)
         self.support = npappend(self.support, indiv.support)
+        self.support_days = npappend(self.support_days, 0)
         self.comorbidity = npappend(self.comorbidity, indiv.comorbidity)
         self.progress = npappend(self.progress, indiv.progress)
         self.move_per_day = npappend(self.move_per_day, indiv.move_per_day)
@@ -105,36 +141,59 @@ class population(object):
             self.strain_types.append(indiv.strain)
             idx = len(self.strain_types) - 1
         self.strain = npappend(self.strain, idx)
+        if indiv.cohort in self.cohort_types:
+            idx = self.cohort_types.index(indiv.cohort)
+        else:
+            self.cohort_types.append(indiv.cohort)
+            self.cohort_dead = npappend(self.cohort_dead, 0)
+            idx = len(self.cohort_types) - 1
+        self.cohort = npappend(self.cohort, idx).astype(npuint8)
         self.rms_v = npappend(self.rms_v, indiv.rms_v)
         self.home = npappend(self.home, nparray(
             indiv.home, dtype=npint64).reshape((1, 2)), axis=0)
+        self.uid = npappend(self.uid, self.next_uid)
+        self.next_uid += 1
+        self.last_pos = None
+        if self.vaccination is not None:
+            self.vaccination.enqueue(self.pop_size - 1)
         return
 
     def __sub__(self, idx: list):
         '''remove persons by [idx]'''
         idx = list(idx)
         self.pop_size -= len(idx)
+        self.n_active -= int(npcount_nonzero(self.active[idx]))
+        self.n_recovered -= int(npcount_nonzero(self.recovered[idx]))
+        self.n_serious -= int(npcount_nonzero(self.support[idx]))
 
         # Delete from numpy array  (We can't track what happened to the dead)
         # Else, remember the dead in a different set of objects
         self.active = npdelete(self.active, idx)
         self.recovered = npdelete(self.recovered, idx)
         self.susceptible = npdelete(self.susceptible, idx)
+        self.vaccinated = npdelete(self.vaccinated, idx)
         self.health = npdelete(self.health, idx)
         self.support = npdelete(self.support, idx)
+        self.support_days = npdelete(self.support_days, idx)
         self.comorbidity = npdelete(self.comorbidity, idx)
         self.progress = npdelete(self.progress, idx)
         self.move_per_day = npdelete(self.move_per_day, idx)
         self.cfr = npdelete(self.cfr, idx)
         self.inf_per_day = npdelete(self.inf_per_day, idx)
         self.strain = npdelete(self.strain, idx)
+        self.cohort = npdelete(self.cohort, idx)
         self.home = npdelete(self.home, idx, axis=0)
         self.rms_v = npdelete(self.rms_v, idx)
+        self.uid = npdelete(self.uid, idx)
+        if self.last_pos is not None:
+            self.last_pos = npdelete(self.last_pos, idx, axis=0)
+        if self.vaccination is not None:
+            self.vaccination.remove(idx)
 
     def compose_pop(self, person_typ: person=None, person_num: int=0):
         '''Add a "whole-sale" of persons belonging to one type'''
         for _ in range(person_num):
-            self + person_typ.__copy__()
+            self + person_typ.__copy__(rng=self.rng.composition)
         return
 
     def analyse_person(self, idx: int) -> person:
@@ -152,11 +211,12 @@ class population(object):
         move_per_day = self.move_per_day[idx]
         strain = self.strain_types[self.strain[idx]]
         rms_v = self.rms_v[idx]
+        cohort = self.cohort_types[self.cohort[idx]]
         return person(
             active=active, recovered=recovered, susceptible=susceptible,
             health=health, support=support, comorbidity=comorbidity,
             progress=progress, move_per_day=move_per_day, strain=strain,
-            p_max=p_max, rms_v=rms_v
+            p_max=p_max, rms_v=rms_v, cohort=cohort
         )
 
     def normalize_pop(self, pop_size=1000000)-> None:
@@ -171,14 +231,13 @@ class population(object):
         # randomly trim
         trim_num = self.pop_size - pop_size
         if trim_num > 0:
-            trim_idx = list(range(self.pop_size))
-            shuffle(trim_idx)
+            trim_idx = self.rng.composition.permutation(self.pop_size)
             self - trim_idx[:trim_num]
         return
 
     def mutate(self, in_strain):
         '''Mutation'''
-        mutations = 1 + nprandom.random(size=3) * 0.02 - 0.01
+        mutations = 1 + self.rng.mutation.random(size=3) * 0.02 - 0.01
         # Then, use each random number in the array
         mut_cfr = in_strain.cfr * mutations[0]
         mut_inf_per_day = in_strain.inf_per_day * mutations[1]
@@ -205,6 +264,8 @@ class population(object):
             self.active[indiv] * pathy.persistence)
         self.space_dep_strain[i_pos, j_pos] = (
             self.active[indiv] * self.strain[indiv])
+        if self.trace is not None:
+            self.trace.depositor[i_pos, j_pos] = self.uid[indiv]
         # Can't collect any more
         return True
 
@@ -214,28 +275,35 @@ class population(object):
             self.space_dep_strain[i_pos, j_pos]]
         if not (in_strain and self.susceptible[indiv]):
             return
-        if (nprandom.random()
+        if (self.rng.infection.random()
             > self.susceptible[indiv] * in_strain.inf_per_exp):
             return
         # Possibility of mutation in pathogen
         # (For Future, to simulate evolution of pathogens)
-        if nprandom.random() < 0.0001: # Rarely, mutate
+        if self.rng.mutation.random() < 0.0001: # Rarely, mutate
             # Motion and probability of mutation arbitrarily chosen
             # (Biological cumulative mutation rates are 10^-6to-7)
             # Cleaner to generate a numpy random array
             pathy_attr = self.mutate(in_strain)
+            event = MUTATION
         else:
             # Indiv is infected by old (unmutated strain)
             pathy_attr = (self.strain_types.index(in_strain),
                           in_strain.cfr, in_strain.inf_per_day)
+            event = INFECTION
         # Get infected
+        self.n_active += not self.active[indiv]
+        self.n_recovered -= bool(self.recovered[indiv])
         self.active[indiv] = True
         self.progress[indiv] = 0.000001
         self.recovered[indiv] = False
         # Some unfortunate indiv will still get infected again
-        self.susceptible[indiv] = nprandom.random() * 0.01
+        self.susceptible[indiv] = self.rng.infection.random() * 0.01
         self.strain[indiv], self.cfr[indiv], self.inf_per_day[indiv] =\
             pathy_attr
+        if self.trace is not None:
+            self.trace.infect(event, self.uid[indiv], pathy_attr[0],
+                              i_pos, j_pos)
         return
 
     def calc_exposure(self, indiv, pos)-> None:
@@ -249,8 +317,33 @@ class population(object):
         return
 
 
-    def random_walk(self, d=None, plot_h=None)-> None:
-        '''Let all population walk randomly'''
+    def quiet_exposure(self, pos, walking)-> bool:
+        '''Exposure of a walk step while nobody is active, vectorized:
+        carriers of past strains only clean their cells (as deposit does)
+        Returns False, without exposing anyone, if someone is active or if
+        someone who may collect stands on a contaminated cell
+        '''
+        if self.n_active:
+            return False
+        i_pos, j_pos = pos[:, 0], pos[:, 1]
+        carrier = npand(walking, self.strain != 0)
+        collector = npand(npand(walking, npnot(carrier)),
+                          self.susceptible != 0)
+        # Cells are only cleaned during the step, so the grid as it is
+        # holds every cell a collector could find contaminated
+        if npany(self.space_dep_strain[i_pos[collector], j_pos[collector]]):
+            return False
+        cells = i_pos[carrier], j_pos[carrier]
+        self.space_contam[cells] = 0
+        self.space_dep_strain[cells] = 0
+        if self.trace is not None:
+            self.trace.depositor[cells] = self.uid[carrier]
+        return True
+
+    def random_walk(self, d=None, plot_h=None, quiet: bool=False)-> None:
+        '''Let all population walk randomly
+        quiet: vectorize steps while nobody is active (same outcome)
+        '''
         walk_left = self.move_per_day.copy()
         # Every day, people start from home
         pos = self.home.copy()
@@ -260,7 +353,7 @@ class population(object):
 
             # All randomly move an edge-length
             pos += nparray(
-                npround((nprandom.random(size=pos.shape) * 2 - 1)
+                npround((self.rng.mobility.random(size=pos.shape) * 2 - 1)
                         * self.rms_v.T[:, None])
                 * (walk_left != 0).T[:, None],
                 dtype=pos.dtype)
@@ -272,24 +365,14 @@ class population(object):
                           dtype=pos.dtype)\
                 + nparray((pos > (self.p_max-1)) * (2 * (self.p_max - 1) - pos),
                           dtype=pos.dtype)
-            for indiv in range(self.pop_size):
-                # TODO: A ufunc or async map would have been faster
-                if walk_left[indiv]:
-                    self.calc_exposure(indiv, pos)
-            if plot_h.contam_dots:
-                strain_persist = self.strain_types[-1].persistence
-                host_types = []
-                host_types.append((pos * (npnot(self.active[:, None])
-                                          * self.susceptible[:, None]
-                                                  > self.resist_def)).tolist())
-                host_types.append((pos * self.active[:, None]).tolist())
-                host_types.append((pos * (npnot(self.active[:, None])
-                                          * (self.susceptible[:, None]
-                                             <= self.resist_def))).tolist())
-                pathn_pers = []
-                for pers in range(int(strain_persist))[::-1]:
-                    pathn_pers.append(npnonzero(self.space_contam==(pers+1)))
-                plot_h.update_contam(host_types, pathn_pers)
+            if not (quiet and self.quiet_exposure(pos, walk_left != 0)):
+                for indiv in range(self.pop_size):
+                    # TODO: A ufunc or async map would have been faster
+                    if walk_left[indiv]:
+                        self.calc_exposure(indiv, pos)
+            if plot_h is not None and plot_h.contam_dots:
+                plot_h.update_contam(pos, self.host_kind(), self.space_contam)
+        self.last_pos = pos
         return
 
     def inf_progress(self)-> None:
@@ -300,11 +383,17 @@ class population(object):
         # Health declines every day
         self.health -= nparray(
             self.active
-            * nprandom.random(size=self.pop_size) * self.cfr,
+            * self.rng.progression.random(size=self.pop_size) * self.cfr,
             dtype=self.health.dtype)
-        self.progress += nprandom.random(size=self.pop_size)\
+        self.progress += self.rng.progression.random(size=self.pop_size)\
             * self.active * self.inf_per_day
         self.progress = self.progress.clip(min=0, max=1)
+        recovering = npand(self.progress==1, npnot(self.recovered))
+        if self.trace is not None:
+            self.trace.log(RECOVERY, self.uid[recovering],
+                           self.strain[recovering])
+        self.n_recovered += int(npcount_nonzero(recovering))
+        self.n_active -= int(npcount_nonzero(npand(recovering, self.active)))
         self.recovered = nparray(
             npor(self.progress==1, self.recovered), dtype=bool)
         self.active = nparray(
@@ -316,7 +405,12 @@ class population(object):
                                         dtype=self.health.dtype)
 
         # If health below threshold, life support is essential
+        supported = self.support
         self.support = self.health < self.serious_health
+        if self.trace is not None:
+            starting = npand(self.support, npnot(supported))
+            self.trace.log(SUPPORT, self.uid[starting], self.strain[starting])
+        self.n_serious = int(npcount_nonzero(self.support))
 
         # Serious patients do not move
         # self.rms_v = nparray(npnot(self.support) * self.rms_v
@@ -325,54 +419,155 @@ class population(object):
         #                            + self.support * 0,
         #                            dtype=self.move_per_day.dtype)
 
-        dead_idx = []
+        # Days spent on support, for first-come-first-served triage
+        self.support_days = nparray(
+            (self.support_days + 1) * self.support, dtype=npint64)
+
         # If support is required but not available, indiv dies
-        dead_idx = npnonzero(self.support)[0].tolist()
-        shuffle(dead_idx)
-        dead_idx = dead_idx[int(self.infrastructure):]
+        dead = self.triage_dead()
 
         # If health < 0: death
-        dead_idx += npnonzero(self.health <= 0.)[0].tolist()
-        dead_idx = list(set(dead_idx))
+        dead |= self.health <= 0.
 
         # Eliminate dead from population
-        if dead_idx:
+        if npany(dead):
+            dead_idx = npnonzero(dead)[0]
+            if self.trace is not None:
+                self.trace.log(DEATH, self.uid[dead_idx],
+                               self.strain[dead_idx])
+            self.n_dead += dead_idx.size
+            self.cohort_dead += npbincount(
+                self.cohort[dead_idx], minlength=len(self.cohort_types))
             self - dead_idx
 
         # Contamination reduces over time
+        self.decay_contam()
+        # Infrastructure may grow, but linearly and very slow
+        self.infrastructure = max(min(
+            self.infrastructure + 0.2, self.n_active/5),
+                                  self.infrastructure)
+
+        # Vaccination, when available, happens linearly
+        if self.vaccination is not None:
+            self.vaccination.vaccinate(self)
+        return
+
+    def decay_contam(self)-> None:
+        '''Pathogen on each space cell survives one day less'''
         self.space_contam -= 1
         self.space_contam = self.space_contam.clip(min=0)
         self.space_dep_strain = nparray(
             self.space_dep_strain * nparray(self.space_contam, dtype=bool),
             dtype=self.space_dep_strain.dtype
         )
-        # Infrastructure may grow, but linearly and very slow
-        self.infrastructure = max(min(
-            self.infrastructure + 0.2, self.active.sum()/5),
-                                  self.infrastructure)
+        return
 
-        # Vaccination, when available, happens linearly
-        self.susceptible -= nparray(
-            self.vac_resist * nparray(
-                nprandom.random(self.pop_size) < self.vac_cov, dtype=bool))
-        self.susceptible = self.susceptible.clip(min=0)
+    def host_kind(self) -> nparray:
+        '''Index of each person in frames.HOSTS:
+        0: susceptible, 1: active (infected), 2: resistant
+        '''
+        kind = nparray(self.susceptible <= self.resist_def, dtype=npuint8) * 2
+        kind[self.active] = 1
+        return kind
+
+    def quiescent(self) -> bool:
+        '''Nobody is active, so nobody deposits pathogen'''
+        return not self.n_active
+
+    def start_vaccination(self, vac_resist: float=None, vac_cov: float=None,
+                          vac_priority: str=None)-> None:
+        '''Vaccine is available, queue the population for doses'''
+        self.vac_resist = self.vac_resist if vac_resist is None else vac_resist
+        self.vac_cov = self.vac_cov if vac_cov is None else vac_cov
+        self.vac_priority = vac_priority or self.vac_priority
+        self.vaccination = vac_scheduler(
+            self, vac_resist=self.vac_resist, vac_cov=self.vac_cov,
+            priority=self.vac_priority)
         return
 
-    def survey(self, o_size=0) -> tuple:
+    def triage_dead(self) -> nparray:
+        '''Mask of supported patients that could not get an ICU bed'''
+        dead = npzeros(self.pop_size, dtype=bool)
+        supported = npnonzero(self.support)[0]
+        beds = int(self.infrastructure)
+        if supported.size <= beds:
+            return dead
+        # Random order breaks ties of every priority rule
+        supported = supported[
+            self.rng.progression.permutation(supported.size)]
+        if self.triage == "severity":
+            # Least healthy get beds first
+            supported = supported[
+                self.health[supported].argsort(kind="stable")]
+        elif self.triage == "fcfs":
+            # Longest on support keep their beds
+            supported = supported[
+                (-self.support_days[supported]).argsort(kind="stable")]
+        dead[supported[beds:]] = True
+        return dead
+
+    def survey(self, o_size=0, by_cohort: bool=False) -> tuple:
         '''Testing results: active, recovered, cases, serious, dead
         if original population size(o_size) is provided dead is returned.
         Else, returns negative of current population size.
+        by_cohort: each result is an array indexed like cohort_types,
+        dead counts only deaths due to infection.
         '''
-        num_active: int = self.active.sum()
-        num_recovered: int = self.recovered.sum()
+        if self.debug:
+            self.check_counters()
+        if by_cohort:
+            return self.cohort_survey()
+        num_active: int = self.n_active
+        num_recovered: int = self.n_recovered
         dead: int = o_size - self.pop_size
         num_cases: int = num_active + num_recovered + dead
-        num_serious: int = nparray(self.support).sum()
+        num_serious: int = self.n_serious
         return num_active, num_recovered, num_cases, num_serious, dead
 
-    def pass_day(self, plot_h=None)-> None:
-        '''progress all population and infections'''
-        self.random_walk(plot_h=plot_h)  # Macro-scale population
-        self.inf_progress()  # Micro-scale: infected individual
+    def cohort_survey(self) -> tuple:
+        '''Survey grouped by cohort, one bincount per metric'''
+        num_types = len(self.cohort_types)
+        num_active = npbincount(self.cohort[self.active], minlength=num_types)
+        num_recovered = npbincount(self.cohort[self.recovered],
+                                   minlength=num_types)
+        dead = self.cohort_dead.copy()
+        num_cases = num_active + num_recovered + dead
+        num_serious = npbincount(self.cohort[self.support],
+                                 minlength=num_types)
+        return num_active, num_recovered, num_cases, num_serious, dead
+
+    def check_counters(self)-> None:
+        '''Survey counters must agree with a full count of arrays'''
+        assert self.n_active == npcount_nonzero(self.active), \
+            "active: %d counted, %d tracked" % (
+                npcount_nonzero(self.active), self.n_active)
+        assert self.n_recovered == npcount_nonzero(self.recovered), \
+            "recovered: %d counted, %d tracked" % (
+                npcount_nonzero(self.recovered), self.n_recovered)
+        assert self.n_serious == npcount_nonzero(self.support), \
+            "serious: %d counted, %d tracked" % (
+                npcount_nonzero(self.support), self.n_serious)
+        return
+
+    def pass_day(self, plot_h=None, walk: bool=True,
+                 quiet: bool=False)-> None:
+        '''progress all population and infections
+        walk: False skips movement (persons stay home)
+        quiet: vectorize walk steps while nobody is active (exact)
+        '''
+        if walk:
+            self.random_walk(plot_h=plot_h, quiet=quiet)  # Macro-scale
+        else:
+            self.last_pos = None  # At home
+        if walk or self.n_serious:
+            self.inf_progress()  # Micro-scale: infected individual
+        else:
+            # Nobody is infected or critical: health can't change,
+            # only contamination decays and vaccination goes on
+            self.decay_contam()
+            if self.vaccination is not None:
+                self.vaccination.vaccinate(self)
+        if self.trace is not None:
+            self.trace.flush()
         return
 
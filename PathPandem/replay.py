@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Replay a recorded simulation, without simulating it again
+Frames are rendered off-screen (Agg) in a pool of processes:
+python -m PathPandem.replay <log> --frames <frames.zip>
+'''
+
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from concurrent.futures import ProcessPoolExecutor
+from os import path, makedirs
+from numpy import arange as nparange
+from numpy import diff as npdiff
+from numpy import zeros as npzeros
+from matplotlib import style as mplstyle
+from matplotlib.animation import FFMpegWriter, writers
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.image import imread
+from .frames import read_meta, chunk_names, read_chunk, block_max
+from .observer import LINETYPES, DOTTYPES
+from .track import load_track
+
+
+class replay_figure(object):
+    '''Epidemic curve and (if recorded) contamination map, redrawn for
+    each frame on an off-screen canvas
+    '''
+    def __init__(self, track, meta: dict=None, dpi: int=100,
+                 cmap: str="Reds", max_pixels: int=512)-> None:
+        '''track: survey rows, meta: of frames (read_meta)
+        max_pixels: contamination grid is shrunk (block_max) to fit
+        '''
+        ncols = 1 + (meta is not None)
+        self.fig = Figure(figsize=(6 * ncols, 6), dpi=dpi)
+        FigureCanvasAgg(self.fig)
+        self.days = nparange(len(track))
+        # Survey columns and new cases, as in the live plot
+        self.series = list(track.T) + [npdiff(track[:, 2], prepend=0)]
+        self.epidem_ax = self.fig.add_subplot(1, ncols, 1)
+        self.lines = [self.epidem_ax.plot([], [], label=name, color=color)[0]
+                      for name, color in LINETYPES.items()]
+        self.epidem_ax.set_xlim(0, max(1, len(track) - 1))
+        self.epidem_ax.set_ylim(0, max(1, track.max()) * 1.05)
+        self.epidem_ax.legend(loc='lower left', bbox_to_anchor=(0.0, 1.01),
+                              ncol=2, borderaxespad=0, frameon=False)
+        self.epidem_ax.set_xlabel("Days")
+        self.epidem_ax.set_ylabel("Persons")
+        self.image = None
+        if meta is None:
+            return
+        p_max = meta["p_max"]
+        self.factor = -(-p_max // max_pixels)
+        self.contam_ax = self.fig.add_subplot(1, ncols, 2)
+        self.image = self.contam_ax.imshow(
+            block_max(npzeros((p_max, p_max)), self.factor).T,
+            origin="lower", extent=(0, p_max, 0, p_max), cmap=cmap,
+            vmin=0, vmax=max(1, meta["persistence"]),
+            interpolation="nearest")
+        self.hosts = [self.contam_ax.scatter([], [], s=1, c=color,
+                                             label=name)
+                      for name, color in DOTTYPES.items()]
+        self.contam_ax.set_xlim(0, p_max)
+        self.contam_ax.set_ylim(0, p_max)
+        self.contam_ax.legend(loc='lower left', bbox_to_anchor=(0.0, 1.01),
+                              ncol=2, borderaxespad=0, frameon=False)
+        self.contam_ax.set_xticks([])
+        self.contam_ax.set_yticks([])
+        self.contam_ax.set_xlabel("West<->East")
+        self.contam_ax.set_ylabel("South<->North")
+        return
+
+    def draw(self, day: int=None, frame: dict=None)-> None:
+        '''Curve till the day (whole track if None) and frame of the day'''
+        end = len(self.days) if day is None else day + 1
+        for line, series in zip(self.lines, self.series):
+            line.set_data(self.days[:end], series[:end])
+        if frame is not None and self.image is not None:
+            self.image.set_data(block_max(frame["contam"], self.factor).T)
+            for kind, scatter in enumerate(self.hosts):
+                scatter.set_offsets(frame["pos"][frame["host"] == kind])
+            self.contam_ax.set_title("Day %d" % frame["day"], loc="right")
+        return
+
+    def save(self, filename: str)-> None:
+        '''PNG (or format of extension)'''
+        self.fig.savefig(filename)
+        return
+
+
+def render_chunk(job: tuple) -> list:
+    '''Render frames of a chunk to PNG files, returns their names'''
+    track, frames, name, meta, output, options = job
+    with mplstyle.context(options["style"]):
+        figure = replay_figure(track, meta, dpi=options["dpi"],
+                               cmap=options["cmap"],
+                               max_pixels=options["max_pixels"])
+        pngs = []
+        for frame in read_chunk(frames, name, meta["p_max"]):
+            figure.draw(frame["day"], frame)
+            pngs.append(path.join(output, "frame_%06d.png" % frame["day"]))
+            figure.save(pngs[-1])
+    return pngs
+
+
+def make_video(pngs: list, filename: str, fps: int=10, dpi: int=100)-> None:
+    '''Stitch rendered frames into a video (needs ffmpeg)'''
+    if not writers.is_available("ffmpeg"):
+        raise RuntimeError("ffmpeg is needed to write videos")
+    first = imread(pngs[0])
+    fig = Figure(figsize=(first.shape[1] / dpi, first.shape[0] / dpi),
+                 dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_axis_off()
+    image = ax.imshow(first)
+    writer = FFMpegWriter(fps=fps)
+    with writer.saving(fig, filename, dpi):
+        for png in pngs:
+            image.set_data(imread(png))
+            writer.grab_frame()
+    return
+
+
+def replay(track_file: str, frames: str=None, output: str="replay",
+           video: str=None, fps: int=10, workers: int=None,
+           style: str="dark_background", dpi: int=100, cmap: str="Reds",
+           max_pixels: int=512) -> list:
+    '''Render a recorded run, returns names of PNG files
+    track_file: survey log (text or npz), frames: recorder's file,
+    without frames, only the epidemic curve is rendered
+    workers: processes rendering chunks of frames (None: all processors)
+    '''
+    makedirs(output, exist_ok=True)
+    track = load_track(track_file)
+    options = {"style": style, "dpi": dpi, "cmap": cmap,
+               "max_pixels": max_pixels}
+    if frames is None:
+        with mplstyle.context(style):
+            figure = replay_figure(track, dpi=dpi)
+            figure.draw()
+            pngs = [path.join(output, "epidemic.png")]
+            figure.save(pngs[0])
+        return pngs
+    meta = read_meta(frames)
+    jobs = [(track, frames, name, meta, output, options)
+            for name in chunk_names(frames)]
+    if workers == 1:
+        rendered = [render_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(render_chunk, jobs))
+    pngs = [png for chunk_pngs in rendered for png in chunk_pngs]
+    if video and pngs:
+        make_video(pngs, video, fps=fps, dpi=dpi)
+    return pngs
+
+
+def main()-> None:
+    '''Command line'''
+    parser = ArgumentParser(description="Replay a recorded simulation",
+                            formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument("track",
+                        help="Survey log (text or npz) of the simulation")
+    parser.add_argument("--frames", default=None, type=str,
+                        help="Frames recorded with --frames")
+    parser.add_argument("--output", default="replay", type=str,
+                        help="Directory of PNG frames")
+    parser.add_argument("--video", default=None, type=str,
+                        help="Also stitch frames into this video (ffmpeg)")
+    parser.add_argument("--fps", default=10, type=int,
+                        help="Frames per second of video")
+    parser.add_argument("--workers", default=None, type=int,
+                        help="Processes rendering frames (all CPUs)")
+    parser.add_argument("--style", default="dark_background", type=str,
+                        help="matplotlib style")
+    parser.add_argument("--dpi", default=100, type=int,
+                        help="Resolution of frames")
+    parser.add_argument("--cmap", default="Reds", type=str,
+                        help="Colour map of contamination")
+    parser.add_argument("--max-pixels", default=512, type=int,
+                        help="Larger grids are shrunk, keeping block maxima")
+    args = parser.parse_args()
+    replay(args.track, frames=args.frames, output=args.output,
+           video=args.video, fps=args.fps, workers=args.workers,
+           style=args.style, dpi=args.dpi, cmap=args.cmap,
+           max_pixels=args.max_pixels)
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Random number streams'''
+
+
+from numpy.random import Generator, PCG64, SeedSequence
+
+
+# One independent stream per component of the simulation
+STREAMS = ("composition", "mobility", "infection", "mutation",
+           "progression", "vaccination", "discovery")
+
+
+class rng_streams(object):
+    '''Seeded, independent random Generators for each component'''
+    def __init__(self, seed: int=None, seed_seq: SeedSequence=None)-> None:
+        '''seed: None draws fresh entropy from the OS,
+        a SeedSequence (e.g. spawned for a replicate) is copied, so that
+        spawning streams doesn't change it for others sharing it
+        '''
+        if isinstance(seed, SeedSequence):
+            seed_seq = seed
+        if seed_seq is None:
+            seed_seq = SeedSequence(seed)
+        else:
+            seed_seq = SeedSequence(
+                seed_seq.entropy, spawn_key=seed_seq.spawn_key,
+                pool_size=seed_seq.pool_size,
+                n_children_spawned=seed_seq.n_children_spawned)
+        self.seed_seq = seed_seq
+        for name, child in zip(STREAMS, self.seed_seq.spawn(len(STREAMS))):
+            setattr(self, name, Generator(PCG64(child)))
+        return
+
+    @property
+    def seed(self) -> int:
+        '''Entropy that reproduces these streams'''
+        return self.seed_seq.entropy
+
+    def spawn(self, num: int=1) -> list:
+        '''Independent sets of streams, e.g. for replicates or workers'''
+        return [rng_streams(seed_seq=child)
+                for child in self.seed_seq.spawn(num)]
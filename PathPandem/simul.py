@@ -18,113 +18,355 @@
 # along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
 '''Simulate'''
 
-from numpy import array as nparray
+from signal import signal, SIGTERM
+from time import perf_counter
 from numpy import any as npany
-from numpy import append as npappend
-from numpy import int16 as npint64
-from numpy import random as nprandom
-from .definitions import MED_DISCOVERY
+from .checkpoint import save_checkpoint, load_checkpoint, restore_state
+from .discovery import random_discovery, fixed_discovery
+from .frames import frame_recorder
+from .observer import observer
+from .sink import sink, text_sink
+from .trace import event_trace
+from .track import trajectory, simul_result
 
-def simulate(
-        city, logfile, simul_pop, med_eff: float=0.,
-        med_recov: float=0, vac_res: float=0, vac_cov: float=0.,
-        movement_restrict: int=0, contact_restrict: int=0,
-        lockdown_chunk: int=0, lockdown_panic: int=1, seed_inf: int=0,
-        zero_lock: bool=False, intervention: bool=False, early_action=False,
-        plot_h=None
-) -> tuple:
-    '''Recursive simulation of each day'''
-    vaccine_discovery_date = 0
-    drug_discovery_date = 0
-    while not vaccine_discovery_date:
-        for idx, k in enumerate(nprandom.random(size=(int(5/MED_DISCOVERY)))):
-            if k < MED_DISCOVERY:
-                vaccine_discovery_date = idx
-    while not drug_discovery_date:
-        for idx, k in enumerate(nprandom.random(size=(int(5/MED_DISCOVERY)))):
-            if k < MED_DISCOVERY:
-                drug_discovery_date = idx
-    lockdown = 0
-    next_lockdown = seed_inf * lockdown_panic
-    # Track infection trends
-    track: nparray = nparray([[]] * 0, dtype=npint64).reshape((0, 5))
-    days = 0
-    args = city.survey(simul_pop)
-    newsboard = (
-        "Total Population %d" % city.pop_size,
-        "ICUs Available: %d/%d"
-        % (city.infrastructure - args[3], city.infrastructure),
-    )
-    reaction = (zero_lock, early_action, intervention,
-                days > vaccine_discovery_date, days > drug_discovery_date)
-    plot_h.update_epidem(days, args, newsboard, lockdown, *reaction)
-    track = npappend(track, nparray(args).reshape((1, 5)), axis=0)
-    print(*args, file=logfile, flush=True)
-    city.pass_day(plot_h)  # IT STARTS!
-    while npany(city.space_contam):  # Absent from persons and places
-        if days == vaccine_discovery_date:
-            city.vaccine_resist = vac_res
-            city.vaccine_cov = vac_cov
-        if days == drug_discovery_date:
-            for idx, pathy in enumerate(city.strain_types):
-                if pathy is not None:
-                    city.strain_types[idx].inf_per_day /= med_recov
-                    city.strain_types[idx].cfr *= med_eff
-                    city.inf_per_day /= med_recov
-                    city.cfr *= med_eff
-        if early_action :
-            if not days:
-                # Restrict movement
-                city.rms_v //= movement_restrict
-                city.move_per_day //= contact_restrict
-            elif days == zero_lock:
-                # End of initial lockdown
-                city.rms_v *= movement_restrict
-                city.move_per_day *= contact_restrict
-        days += 1
-        args = city.survey(simul_pop)
-        newsboard = (
+
+class simulation(object):
+    '''Day-by-day simulation of spread in a population'''
+    def __init__(
+            self, city, logfile=None, simul_pop: int=0, med_eff: float=0.,
+            med_recov: float=0, vac_res: float=0, vac_cov: float=0.,
+            movement_restrict: int=0, contact_restrict: int=0,
+            lockdown_chunk: int=0, lockdown_panic: int=1, seed_inf: int=0,
+            zero_lock: bool=False, intervention: bool=False,
+            early_action=False, plot_h=None, discovery=None,
+            checkpoint_every: int=0, checkpoint_path: str=None,
+            fast_forward: str="exact", max_days: int=None, plateau: int=0,
+            active_below: int=0, trace=None, frames=None,
+    )-> None:
+        '''logfile: sink of daily survey rows, an open text file is written
+        as it used to be (text_sink flushed every day)
+        discovery: schedule of vaccine and drug discovery dates,
+        default: random_discovery
+        plot_h: observer of daily updates, default: headless observer
+        checkpoint_every: save state to checkpoint_path every these many
+        days (0: never) and, while running, on SIGTERM
+        fast_forward: while nobody is active, walk without visiting every
+        person ("exact", results don't change), skip movement altogether
+        ("aggressive", left-over contamination is assumed to infect nobody)
+        or never ("off"); days fast-forwarded are listed in fast_forwarded
+        max_days, plateau, active_below: stop early, after these many days,
+        when cases don't rise for "plateau" days or when fewer than
+        "active_below" persons are active (0 or None: don't)
+        trace: event_trace (or name of its file) recording infections,
+        support, recoveries and deaths
+        frames: frame_recorder (or name of its file) saving daily grids and
+        positions
+        '''
+        self.city = city
+        if logfile is not None and not isinstance(logfile, sink):
+            logfile = text_sink(logfile)
+        self.logfile = logfile  # Survey is written here, if given
+        self.simul_pop = simul_pop
+        self.med_eff = med_eff
+        self.med_recov = med_recov
+        self.vac_res = vac_res
+        self.vac_cov = vac_cov
+        self.movement_restrict = movement_restrict
+        self.contact_restrict = contact_restrict
+        self.lockdown_chunk = lockdown_chunk
+        self.lockdown_panic = lockdown_panic
+        self.zero_lock = zero_lock
+        self.intervention = intervention
+        self.early_action = early_action
+        self.plot_h = plot_h or observer()
+        discovery = discovery or random_discovery()
+        self.vaccine_discovery_date, self.drug_discovery_date =\
+            discovery.dates(city.rng.discovery)
+        self.lockdown = 0
+        self.next_lockdown = seed_inf * lockdown_panic
+        self.lockdowns = []  # (start, end) days
+        if early_action:
+            self.lockdowns.append((0, zero_lock))
+        # Track infection trends
+        self.track = trajectory()
+        self.days = 0
+        self.started = False
+        self.finished = False
+        self.elapsed = 0.  # Wall-clock seconds spent stepping
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_path = checkpoint_path
+        self.terminated = False  # SIGTERM received
+        self.fast_forward = fast_forward
+        self.fast_forwarded = []  # Days on which nobody was active
+        self.max_days = max_days
+        self.plateau = plateau
+        self.active_below = active_below
+        if trace is not None:
+            if not isinstance(trace, event_trace):
+                trace = event_trace(trace)
+            trace.attach(city)
+        if frames is not None:
+            if not isinstance(frames, frame_recorder):
+                frames = frame_recorder(frames)
+            frames.attach(city)
+        self.frames = frames
+        return
+
+    def __iter__(self):
+        '''Lazily yield (day, survey, events) of each day'''
+        while True:
+            today = self.step()
+            if today is None:
+                return
+            yield today
+
+    def record(self) -> tuple:
+        '''Survey, track, log and display the day'''
+        city = self.city
+        args = city.survey(self.simul_pop)
+        newsboard = [
             "Total Population %d" % city.pop_size,
             "ICUs Available: %d/%d"
             % (city.infrastructure - args[3], city.infrastructure),
-        )
-        if days > drug_discovery_date:
+        ]
+        if self.days > self.drug_discovery_date:
             newsboard.append("Drug Discovered")
-        if days > vaccine_discovery_date:
+        if self.days > self.vaccine_discovery_date:
             newsboard.append("Vaccine Discovered")
-        track = npappend(track, nparray(args).reshape((1, 5)), axis=0)
-        print(*args, file=logfile, flush=True)
-        city.pass_day(plot_h)
-        reaction = (zero_lock, early_action, intervention,
-                    days > vaccine_discovery_date, days > drug_discovery_date)
-        plot_h.update_epidem(days, args, newsboard, lockdown, *reaction)
-        if intervention and lockdown == 0 and (args[2] > next_lockdown):
-            next_lockdown *= lockdown_panic
+        self.track.append(args)
+        if self.logfile is not None:
+            self.logfile.write(args)
+        reaction = (self.zero_lock, self.early_action, self.intervention,
+                    self.days > self.vaccine_discovery_date,
+                    self.days > self.drug_discovery_date)
+        self.plot_h.update_epidem(self.days, args, newsboard, self.lockdown,
+                                  *reaction)
+        return args
+
+    def restrict(self, fold: bool=True)-> None:
+        '''Restrict (or relax) movement and contacts'''
+        if fold:
+            self.city.rms_v //= self.movement_restrict
+            self.city.move_per_day //= self.contact_restrict
+        else:
+            self.city.rms_v *= self.movement_restrict
+            self.city.move_per_day *= self.contact_restrict
+        return
+
+    def intervene(self, events: list)-> None:
+        '''Medical discoveries and early action, before the day begins'''
+        city = self.city
+        if self.days == self.vaccine_discovery_date:
+            city.start_vaccination(vac_resist=self.vac_res,
+                                   vac_cov=self.vac_cov)
+            events.append("vaccine")
+        if self.days == self.drug_discovery_date:
+            for idx, pathy in enumerate(city.strain_types):
+                if pathy is not None:
+                    city.strain_types[idx].inf_per_day /= self.med_recov
+                    city.strain_types[idx].cfr *= self.med_eff
+                    city.inf_per_day /= self.med_recov
+                    city.cfr *= self.med_eff
+            events.append("drug")
+        if self.early_action:
+            if not self.days:
+                self.restrict()
+                events.append("lockdown")
+            elif self.days == self.zero_lock:
+                # End of initial lockdown
+                self.restrict(fold=False)
+                events.append("unlock")
+        return
+
+    def panic(self, args: tuple, events: list)-> None:
+        '''Lockdown in response to spread of infection'''
+        if not self.intervention:
+            return
+        if self.lockdown == 0 and (args[2] > self.next_lockdown):
+            self.next_lockdown *= self.lockdown_panic
             # Panic by infection Spread
-            lockdown = 1
-            city.rms_v //= movement_restrict
-            city.move_per_day //= contact_restrict
-        if intervention and lockdown:
-            lockdown += 1
-        if intervention and lockdown > lockdown_chunk + 1:
+            self.lockdown = 1
+            self.lockdowns.append((self.days, None))
+            self.restrict()
+            events.append("lockdown")
+        if self.lockdown:
+            self.lockdown += 1
+        if self.lockdown > self.lockdown_chunk + 1:
             # Business as usual
-            city.rms_v *= movement_restrict
-            city.move_per_day *= contact_restrict
-            lockdown = 0
-    args = city.survey(simul_pop)
-    newsboard = (
-        "Total Population %d" % city.pop_size,
-        "ICUs Available: %d/%d"
-        % (city.infrastructure - args[3], city.infrastructure),
-    )
-    if days > drug_discovery_date:
-        newsboard.append("Drug Discovered")
-    if days > vaccine_discovery_date:
-        newsboard.append("Vaccine Discovered")
-    track = npappend(track, nparray(args).reshape((1, 5)), axis=0)
-    print(*args, file=logfile, flush=True)
-    reaction = (zero_lock, early_action, intervention,
-                days > vaccine_discovery_date, days > drug_discovery_date)
-    plot_h.update_epidem(days, args, newsboard, lockdown, *reaction)
-    return
+            self.restrict(fold=False)
+            self.lockdown = 0
+            self.lockdowns[-1] = (self.lockdowns[-1][0], self.days)
+            events.append("unlock")
+        return
+
+    def stop_reason(self) -> str:
+        '''Stop condition that is met, "" if none'''
+        if self.max_days and self.days >= self.max_days:
+            return "max_days"
+        rows = self.track.rows
+        if self.plateau and len(rows) > self.plateau\
+           and rows[-1, 2] == rows[-1 - self.plateau, 2]:
+            return "plateau"
+        if self.city.n_active < self.active_below:
+            return "active_below"
+        return ""
+
+    def walk(self) -> bool:
+        '''Whether the population moves today'''
+        if self.fast_forward != "aggressive" or self.plot_h.contam_dots:
+            return True  # Movements are displayed
+        return not self.city.quiescent()
+
+    def step(self) -> tuple:
+        '''Pass a day: (day, survey, events); None after the end'''
+        if self.finished:
+            return None
+        start_time = perf_counter()
+        events = []
+        if not self.started:
+            self.started = True  # IT STARTS!
+        else:
+            reason = self.stop_reason()
+            if reason or not npany(self.city.space_contam):
+                # Absent from persons and places, or stopped early
+                args = self.record()
+                if self.lockdown:
+                    self.lockdowns[-1] = (self.lockdowns[-1][0], self.days)
+                self.finished = True
+                if self.logfile is not None:
+                    self.logfile.sync()
+                if self.frames is not None:
+                    self.frames.close()
+                self.elapsed += perf_counter() - start_time
+                return self.days, args, ["end", reason] if reason else ["end"]
+            self.intervene(events)
+            self.days += 1
+        args = self.record()
+        if self.city.trace is not None:
+            self.city.trace.day = self.days
+        if self.fast_forward != "off" and self.city.quiescent():
+            self.fast_forwarded.append(self.days)
+            events.append("fast_forward")
+        self.city.pass_day(self.plot_h, walk=self.walk(),
+                           quiet=self.fast_forward != "off")
+        if self.frames is not None:
+            self.frames.record(self.days, self.city)
+        self.panic(args, events)
+        self.elapsed += perf_counter() - start_time
+        if self.checkpoint_every and self.days\
+           and not self.days % self.checkpoint_every:
+            self.checkpoint()
+        return self.days, args, events
+
+    def checkpoint(self, filename: str=None)-> None:
+        '''Save state to filename (default: checkpoint_path)'''
+        if self.logfile is not None:
+            self.logfile.sync()  # Log holds the days saved
+        if self.frames is not None:
+            self.frames.flush()  # So do frames
+        save_checkpoint(self, filename or self.checkpoint_path)
+        return
+
+    def _terminate(self, signum, frame)-> None:
+        '''SIGTERM handler: stop after the day being simulated'''
+        self.terminated = True
+        return
+
+    def run(self, days: int=None) -> simul_result:
+        '''Step till the end, or for "days" more days
+        With a checkpoint_path, SIGTERM saves a checkpoint and exits
+        '''
+        handler = None
+        if self.checkpoint_path:
+            try:
+                handler = signal(SIGTERM, self._terminate)
+            except ValueError:
+                pass  # Signals reach only the main thread
+        try:
+            for num, _ in enumerate(self, start=1):
+                if self.terminated:
+                    self.checkpoint()
+                    raise SystemExit(128 + SIGTERM)
+                if days is not None and num >= days:
+                    break
+        finally:
+            if handler is not None:
+                signal(SIGTERM, handler)
+            if self.frames is not None:
+                self.frames.flush()  # Frames till interruption
+        return self.result()
+
+    def result(self) -> simul_result:
+        '''Survey track, discovery dates and lockdown periods so far'''
+        return simul_result(
+            track=self.track.rows,
+            vaccine_discovery_date=self.vaccine_discovery_date,
+            drug_discovery_date=self.drug_discovery_date,
+            lockdowns=list(self.lockdowns), days=self.days,
+            elapsed=self.elapsed, fast_forwarded=list(self.fast_forwarded),
+        )
+
+
+def simulate(
+        city, logfile, simul_pop, med_eff: float=0.,
+        med_recov: float=0, vac_res: float=0, vac_cov: float=0.,
+        movement_restrict: int=0, contact_restrict: int=0,
+        lockdown_chunk: int=0, lockdown_panic: int=1, seed_inf: int=0,
+        zero_lock: bool=False, intervention: bool=False, early_action=False,
+        plot_h=None, discovery=None, checkpoint_every: int=0,
+        checkpoint_path: str=None, resume_from: str=None,
+        fast_forward: str="exact", max_days: int=None, plateau: int=0,
+        active_below: int=0, trace=None, frames=None,
+) -> simul_result:
+    '''Simulate each day till the infection is absent
+    Returns daily survey track, discovery dates and lockdown periods
+    resume_from: continue the simulation saved in this checkpoint,
+    (city, simul_pop and the scenario are restored from it)
+    Other arguments are those of simulation
+    '''
+    if resume_from:
+        return resume(resume_from, logfile=logfile, plot_h=plot_h,
+                      checkpoint_every=checkpoint_every,
+                      checkpoint_path=checkpoint_path, trace=trace,
+                      frames=frames).run()
+    return simulation(
+        city=city, logfile=logfile, simul_pop=simul_pop, med_eff=med_eff,
+        med_recov=med_recov, vac_res=vac_res, vac_cov=vac_cov,
+        movement_restrict=movement_restrict,
+        contact_restrict=contact_restrict, lockdown_chunk=lockdown_chunk,
+        lockdown_panic=lockdown_panic, seed_inf=seed_inf,
+        zero_lock=zero_lock, intervention=intervention,
+        early_action=early_action, plot_h=plot_h, discovery=discovery,
+        checkpoint_every=checkpoint_every, checkpoint_path=checkpoint_path,
+        fast_forward=fast_forward, max_days=max_days, plateau=plateau,
+        active_below=active_below, trace=trace, frames=frames,
+    ).run()
+
 
+def resume(filename: str, logfile=None, plot_h=None, checkpoint_every: int=0,
+           checkpoint_path: str=None, trace=None, frames=None) -> simulation:
+    '''Simulation saved in a checkpoint, continues exactly as it would have
+    checkpoint_path: default, the checkpoint being resumed
+    logfile: sink continuing the log, rows written after the checkpoint
+    are dropped
+    trace, frames: continue these recordings from the checkpoint's day
+    '''
+    city, state = load_checkpoint(filename)
+    if trace is not None and not isinstance(trace, event_trace):
+        # Continues the trace, from the day of the checkpoint
+        trace = event_trace(trace, resume_day=state["days"])
+    if frames is not None:
+        if not isinstance(frames, frame_recorder):
+            frames = frame_recorder(frames)
+        frames.resume_day = state["days"]
+    sim = simulation(
+        city=city, logfile=logfile, plot_h=plot_h,
+        discovery=fixed_discovery(vaccine=state["vaccine_discovery_date"],
+                                  drug=state["drug_discovery_date"]),
+        checkpoint_every=checkpoint_every,
+        checkpoint_path=checkpoint_path or filename, trace=trace,
+        frames=frames, **state["params"])
+    restore_state(sim, state)
+    if sim.logfile is not None:
+        sim.logfile.trim(len(state["track"]))
+    return sim
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Destinations of daily survey rows'''
+
+
+from os import path, replace
+from queue import Queue
+from threading import Thread
+from numpy import array as nparray
+from numpy import savez as npsavez
+from .track import SURVEY_COLUMNS, trajectory, load_track
+
+
+# Queued to a threaded_sink: sync target
+SYNC = "sync"
+
+# Header of text logs
+LOG_HEADER = ("Active(INST)", "Recovered", "Cases", "Critical(INST)",
+              "Deaths")
+
+
+class sink(object):
+    '''Survey rows are buffered and written out every "flush_every" rows
+    (0: only on flush or close)
+    '''
+    def __init__(self, flush_every: int=1)-> None:
+        self.flush_every = flush_every
+        self.pending: int = 0  # Rows buffered since the last flush
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc)-> None:
+        self.close()
+        return
+
+    def write(self, row: tuple)-> None:
+        '''Buffer a day's survey'''
+        self.buffer(row)
+        self.pending += 1
+        if self.flush_every and self.pending >= self.flush_every:
+            self.flush()
+        return
+
+    def buffer(self, row: tuple)-> None:
+        '''Keep row till the next flush (this null sink keeps nothing)'''
+        return
+
+    def flush(self)-> None:
+        '''Write out buffered rows'''
+        self.pending = 0
+        return
+
+    def sync(self)-> None:
+        '''Rows so far on disk, e.g. before a checkpoint'''
+        self.flush()
+        return
+
+    def trim(self, rows: int)-> None:
+        '''Keep the first "rows" rows of a continued log, e.g. those of the
+        checkpoint being resumed, before more are written
+        '''
+        return
+
+    def close(self)-> None:
+        '''Flush and release the destination'''
+        self.flush()
+        return
+
+
+class text_sink(sink):
+    '''Space separated text, a line per day (format of print)'''
+    def __init__(self, logfile, flush_every: int=1, header: tuple=None,
+                 mode: str="w")-> None:
+        '''logfile: name of file, opened in "mode", or an open text file
+        (left open on close)
+        header: first line, e.g. LOG_HEADER
+        '''
+        super().__init__(flush_every=flush_every)
+        self.owned = isinstance(logfile, str)
+        self.handle = open(logfile, mode) if self.owned else logfile
+        self.lines: list = []
+        if header:
+            self.lines.append(" ".join(header) + "\n")
+            self.flush()
+        return
+
+    def buffer(self, row: tuple)-> None:
+        self.lines.append(" ".join(str(val) for val in row) + "\n")
+        return
+
+    def flush(self)-> None:
+        if self.lines:
+            self.handle.write("".join(self.lines))
+            self.lines = []
+        self.handle.flush()
+        super().flush()
+        return
+
+    def trim(self, rows: int)-> None:
+        '''Header and complete lines of the first "rows" rows are kept
+        (logs opened for writing only hold nothing to trim)
+        '''
+        self.flush()
+        if not self.handle.readable():
+            return
+        self.handle.seek(0)
+        kept = 0  # Offset after the last kept line
+        line = self.handle.readline()
+        while line.endswith("\n"):
+            fields = line.split()
+            is_row = bool(fields) and fields[0].lstrip("-").isdigit()
+            if is_row and not rows:
+                break
+            rows -= is_row
+            kept = self.handle.tell()
+            line = self.handle.readline()
+        self.handle.truncate(kept)
+        self.handle.seek(0, 2)
+        return
+
+    def close(self)-> None:
+        super().close()
+        if self.owned:
+            self.handle.close()
+        return
+
+
+class npz_sink(sink):
+    '''All rows in a npz file, written on sync (checkpoints) and close
+    Flushes keep rows in memory: rewriting the file every day costs
+    quadratic I/O
+    '''
+    def __init__(self, filename: str, flush_every: int=0,
+                 append: bool=False)-> None:
+        '''append: continue the rows saved in filename'''
+        super().__init__(flush_every=flush_every)
+        self.filename = filename
+        self.track = trajectory()
+        if append and path.isfile(filename):
+            for row in load_track(filename):
+                self.track.append(row)
+        return
+
+    def buffer(self, row: tuple)-> None:
+        self.track.append(row)
+        return
+
+    def trim(self, rows: int)-> None:
+        self.track.size = min(self.track.size, rows)
+        return
+
+    def sync(self)-> None:
+        '''Written to a temporary file first, then renamed'''
+        partial = self.filename + ".part"
+        with open(partial, "wb") as npz_h:
+            npsavez(npz_h, columns=nparray(SURVEY_COLUMNS),
+                    track=self.track.rows)
+        replace(partial, self.filename)
+        super().sync()
+        return
+
+    def close(self)-> None:
+        self.sync()
+        super().close()
+        return
+
+
+class parquet_sink(sink):
+    '''Columns of a parquet file, a row group per flush (needs pyarrow)
+    The file is (re)created on the first flush
+    '''
+    def __init__(self, filename: str, flush_every: int=256,
+                 append: bool=False)-> None:
+        '''append: continue the rows saved in filename (rewritten once)'''
+        super().__init__(flush_every=flush_every)
+        import pyarrow
+        from pyarrow import parquet
+        self.pyarrow = pyarrow
+        self.parquet = parquet
+        self.filename = filename
+        self.schema = pyarrow.schema(
+            [(name, pyarrow.int64()) for name in SURVEY_COLUMNS])
+        self.saved = None  # Rows of the continued log, till rewritten
+        if append and path.isfile(filename):
+            self.saved = parquet.read_table(filename, schema=self.schema)
+        self.writer = None
+        self.rows: list = []
+        return
+
+    def buffer(self, row: tuple)-> None:
+        self.rows.append(tuple(row))
+        return
+
+    def trim(self, rows: int)-> None:
+        if self.writer is not None:
+            raise ValueError("%s is trimmed after it was rewritten"
+                             % self.filename)
+        if self.saved is not None:
+            self.saved = self.saved.slice(0, rows)
+        return
+
+    def flush(self)-> None:
+        if self.writer is None:
+            self.writer = self.parquet.ParquetWriter(self.filename,
+                                                     self.schema)
+            if self.saved is not None and self.saved.num_rows:
+                self.writer.write_table(self.saved)
+            self.saved = None
+        if self.rows:
+            columns = nparray(self.rows).T
+            self.writer.write_table(self.pyarrow.Table.from_arrays(
+                [self.pyarrow.array(column) for column in columns],
+                schema=self.schema))
+            self.rows = []
+        super().flush()
+        return
+
+    def close(self)-> None:
+        super().close()
+        self.writer.close()
+        return
+
+
+class threaded_sink(sink):
+    '''Another sink, written by a background thread
+    The simulation only queues rows, disk I/O happens in the thread
+    '''
+    def __init__(self, target: sink, queue_size: int=4096)-> None:
+        '''target: sink that writes rows, flushes at its own flush_every'''
+        super().__init__(flush_every=0)
+        self.target = target
+        self.queue: Queue = Queue(maxsize=queue_size)
+        self.error: Exception = None  # Raised by the thread
+        self.thread = Thread(target=self._drain, daemon=True)
+        self.thread.start()
+        return
+
+    def _drain(self)-> None:
+        '''Write queued rows: None stops, () flushes, SYNC syncs
+        After an error, rows are discarded (so that puts never block)
+        '''
+        while True:
+            row = self.queue.get()
+            try:
+                if row is None:
+                    return
+                if self.error is not None:
+                    continue
+                if row is SYNC:
+                    self.target.sync()
+                elif row:
+                    self.target.write(row)
+                else:
+                    self.target.flush()
+            except Exception as err:
+                self.error = err
+            finally:
+                self.queue.task_done()
+
+    def _put(self, item)-> None:
+        '''Queue for the thread, unless it has failed'''
+        if self.error is not None:
+            raise self.error
+        self.queue.put(item)
+        return
+
+    def buffer(self, row: tuple)-> None:
+        self._put(tuple(row))
+        return
+
+    def flush(self)-> None:
+        '''Ask the thread to flush (doesn't wait)'''
+        self._put(())
+        super().flush()
+        return
+
+    def sync(self)-> None:
+        '''Wait till the thread has synced every row queued so far'''
+        self._put(SYNC)
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+        super().flush()
+        return
+
+    def trim(self, rows: int)-> None:
+        '''Trimmed by this thread, once that thread has written the
+        rows queued so far (and waits for more)
+        '''
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+        self.target.trim(rows)
+        return
+
+    def close(self)-> None:
+        '''Write out everything queued and close target'''
+        self.queue.put(None)
+        self.thread.join()
+        try:
+            self.target.close()
+        except Exception:
+            if self.error is None:
+                raise
+        if self.error is not None:
+            raise self.error
+        return
+
+
+def open_sink(filename: str, log_format: str="text", flush_every: int=None,
+              threaded: bool=False, append: bool=False) -> sink:
+    '''Sink of a format: "text" (with LOG_HEADER), "npz" or "parquet"
+    flush_every: rows between writes, default: that of the format
+    (text: every row, parquet: 256, npz: only on sync)
+    append: continue the log (e.g. of a resumed simulation, which trims
+    it to the days of its checkpoint)
+    '''
+    flush_kw = {} if flush_every is None else {"flush_every": flush_every}
+    if log_format == "npz":
+        target = npz_sink(filename, append=append, **flush_kw)
+    elif log_format == "parquet":
+        target = parquet_sink(filename, append=append, **flush_kw)
+    elif append:
+        # Readable too, to be trimmed
+        target = text_sink(filename, mode="a+", **flush_kw)
+    else:
+        target = text_sink(filename, header=LOG_HEADER, **flush_kw)
+    if threaded:
+        return threaded_sink(target)
+    return target
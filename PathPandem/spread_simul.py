@@ -18,6 +18,7 @@
 '''Simulate spread of an infectious agent'''
 
 
+from argparse import Namespace
 from sys import exit as sysexit
 from pickle import load
 from .cli import cli
@@ -27,59 +28,133 @@ from .person import person
 from .misc import ih_translate
 from .simul import simulate
 from .compose_pop import compose_homogenous
-from .plot import plot_wrap
+from .discovery import fixed_discovery, scenario_discovery
+from .observer import observer
+from .ensemble import run_ensemble, run_policies
+from .sink import open_sink
+from .frames import frame_recorder
+
+
+# Extension of log file of each format
+LOG_EXTENSION = {"text": "log", "npz": "npz", "parquet": "parquet"}
+
+
+def scenario_kw(params: Namespace) -> tuple:
+    '''Simulation parameters (translated from cli) to keyword arguments of
+    compose_homogenous and simulate
+    '''
+    cfr = ih_translate(cfr=params.cfr/2,
+                       day_per_inf=int(params.day_per_inf*1.414))
+    compose_kw = dict(
+        simul_pop=params.simul_pop, pop_dense=params.pop_dense,
+        infra=params.infra, move_per_day=params.move_per_day,
+        rms_v=params.rms_v, serious_health=params.serious_health,
+        seed_inf=params.seed_inf, feeble_prop=params.feeble_prop,
+        comorbidity=params.comorbidity, resist_prop=params.resist_prop,
+        resistance=params.resistance, cfr=cfr,
+        day_per_inf=params.day_per_inf, inf_per_exp=params.inf_per_exp,
+        persistence=params.persistence, vac_res=params.vac_res,
+        vac_cov=params.vac_cov, resist_def=(1 - params.resistance),
+        triage=params.triage, vac_priority=params.vac_priority,
+    )
+    if params.scenario_file:
+        discovery = scenario_discovery(params.scenario_file)
+    else:
+        discovery = fixed_discovery(vaccine=params.vaccine_day,
+                                    drug=params.drug_day)
+    simul_kw = dict(
+        med_recov=params.med_recov, med_eff=params.med_eff,
+        vac_res=params.vac_res, vac_cov=params.vac_cov,
+        movement_restrict=params.movement_restrict,
+        contact_restrict=params.contact_restrict,
+        lockdown_chunk=params.lockdown_chunk,
+        lockdown_panic=params.lockdown_panic, seed_inf=params.seed_inf,
+        zero_lock=params.zero_lock, intervention=params.intervention,
+        early_action=params.early_action, discovery=discovery,
+        fast_forward=params.fast_forward, max_days=params.max_days,
+        plateau=params.plateau, active_below=params.active_below,
+    )
+    return compose_kw, simul_kw
 
 
 def main():
-    SIMUL_POP, POP_DENSE, INFRA, MOVE_PER_DAY, RMS_V, SEED_INF,\
-        FEEBLE_PROP, COMORBIDITY, RESIST_PROP, RESISTANCE, CFR,\
-        PERSISTENCE, DAY_PER_INF, SERIOUS_HEALTH, INF_PER_EXP,\
-        MOVEMENT_RESTRICT, CONTACT_RESTRICT, LOCKDOWN_CHUNK,\
-        LOCKDOWN_PANIC, ZERO_LOCK, EARLY_ACTION, INTERVENTION,\
-        VAC_RES, VAC_COV, MED_EFF, MED_RECOV, VISUALIZE = cli()
+    PARAMS = cli()
 
     # INITS
-    MAX_SPACE = int(pow(SIMUL_POP/POP_DENSE, 0.5))  # Sqr_mtr
+    MAX_SPACE = int(pow(PARAMS.simul_pop/PARAMS.pop_dense, 0.5))  # Sqr_mtr
 
-    if SIMUL_POP <= SEED_INF:
+    if PARAMS.simul_pop <= PARAMS.seed_inf:
         print("Total population must be less than Seed founder population, resetting...")
     if MAX_SPACE < 2:
         print('''Too less space to simulate
         Increase Population size OR
         Decrease Density of population''')
         sysexit(1)
+    REPLICATED = PARAMS.compare_policies or PARAMS.replicates > 1
+    if REPLICATED and (PARAMS.trace or PARAMS.frames or PARAMS.checkpoint
+                       or PARAMS.resume):
+        print("--trace, --frames, --checkpoint and --resume follow a single "
+              "simulation, not replicates")
+        sysexit(1)
 
-    CFR = ih_translate(cfr=CFR/2, day_per_inf=int(DAY_PER_INF*1.414))
     # Log raw survey numbers
-    FNAME_BASE= int(EARLY_ACTION) * "Early_acted_"\
-            + int(INTERVENTION) * "Intervened_"\
-            + int(not(INTERVENTION or EARLY_ACTION)) * "Uncontrolled_"
-    LOGFILE = open("%sdisease_spread.log" %FNAME_BASE, "w")
-    print("Active(INST)", "Recovered", "Cases", "Critical(INST)", "Deaths",
-          file=LOGFILE, flush=True)
+    FNAME_BASE= int(PARAMS.early_action) * "Early_acted_"\
+            + int(PARAMS.intervention) * "Intervened_"\
+            + int(not(PARAMS.intervention or PARAMS.early_action))\
+            * "Uncontrolled_"
+    COMPOSE_KW, SIMUL_KW = scenario_kw(PARAMS)
+    if PARAMS.compare_policies:
+        # Paired replicates of each policy, no plots
+        COMPARISON = run_policies(
+            COMPOSE_KW, SIMUL_KW, replicates=PARAMS.replicates,
+            workers=PARAMS.workers, seed=PARAMS.seed, batch=PARAMS.batch,
+            template=PARAMS.template)
+        COMPARISON.save("Policies_comparison.npz")
+        sysexit(0)
+    if PARAMS.replicates > 1:
+        # Mean and quantiles of replicates, no plots
+        ENSEMBLE = run_ensemble(
+            COMPOSE_KW, SIMUL_KW, replicates=PARAMS.replicates,
+            workers=PARAMS.workers, seed=PARAMS.seed, batch=PARAMS.batch,
+            template=PARAMS.template)
+        ENSEMBLE.save("%sensemble.npz" % FNAME_BASE)
+        sysexit(0)
 
-    # INIT pathogen, host-type
-    CITY, SIMUL_POP, PATHY, SPACE = compose_homogenous(
-        simul_pop=SIMUL_POP, pop_dense=POP_DENSE, infra=INFRA,
-        move_per_day=MOVE_PER_DAY, rms_v=RMS_V, serious_health=SERIOUS_HEALTH,
-        seed_inf=SEED_INF, feeble_prop=FEEBLE_PROP, comorbidity=COMORBIDITY,
-        resist_prop=RESIST_PROP, resistance=RESISTANCE, cfr=CFR,
-        day_per_inf=DAY_PER_INF, inf_per_exp=INF_PER_EXP,
-        persistence=PERSISTENCE, vac_res=VAC_RES, vac_cov=VAC_COV,
-        resist_def=(1 - RESISTANCE),
-    )
-    PLOT_H = plot_wrap(SPACE, PERSISTENCE, SIMUL_POP, VISUALIZE)
-    err = simulate(
-        city=CITY, logfile=LOGFILE, simul_pop=SIMUL_POP, med_recov=MED_RECOV, med_eff=MED_EFF,
-        vac_res=VAC_RES, vac_cov=VAC_COV, movement_restrict=MOVEMENT_RESTRICT,
-        contact_restrict=CONTACT_RESTRICT, lockdown_chunk=LOCKDOWN_CHUNK,
-        lockdown_panic=LOCKDOWN_PANIC, seed_inf=SEED_INF, zero_lock=ZERO_LOCK,
-        intervention=INTERVENTION, early_action=EARLY_ACTION, plot_h=PLOT_H,
-    )
+    # Survey of resumed days continues the log
+    LOGFILE = open_sink(
+        "%sdisease_spread.%s" % (FNAME_BASE,
+                                 LOG_EXTENSION[PARAMS.log_format]),
+        log_format=PARAMS.log_format, flush_every=PARAMS.log_flush,
+        threaded=PARAMS.log_thread, append=bool(PARAMS.resume))
+    SIMUL_POP = PARAMS.simul_pop
+    if PARAMS.resume:
+        CITY, SPACE = None, MAX_SPACE
+    else:
+        # INIT pathogen, host-type
+        CITY, SIMUL_POP, PATHY, SPACE = compose_homogenous(seed=PARAMS.seed,
+                                                           **COMPOSE_KW)
+    if PARAMS.headless:
+        PLOT_H = observer()
+    else:
+        # matplotlib is imported only if plots are wanted
+        from .plot import plot_wrap
+        PLOT_H = plot_wrap(SPACE, PARAMS.persistence, SIMUL_POP,
+                           PARAMS.visualize,
+                           redraw_every=PARAMS.redraw_every,
+                           max_fps=PARAMS.max_fps, sample=PARAMS.plot_sample,
+                           seed=PARAMS.seed)
+    # Spatial frames, to replay
+    RECORDER = frame_recorder(PARAMS.frames, sample=PARAMS.frame_sample)\
+        if PARAMS.frames else None
+    with LOGFILE:
+        err = simulate(city=CITY, logfile=LOGFILE, simul_pop=SIMUL_POP,
+                       plot_h=PLOT_H, checkpoint_every=PARAMS.checkpoint_every,
+                       checkpoint_path=PARAMS.checkpoint,
+                       resume_from=PARAMS.resume, trace=PARAMS.trace,
+                       frames=RECORDER, **SIMUL_KW)
 
     # Finally, save
     PLOT_H.savefig("%sdisease_plot.jpg"%FNAME_BASE)
-    LOGFILE.close()
     sysexit(0)
 
 if __name__ == "__main__":
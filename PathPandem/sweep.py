@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Sweep simulation parameters'''
+
+
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from hashlib import sha1
+from itertools import product
+from json import dumps
+from os import path
+from numpy import array as nparray
+from numpy import arange as nparange
+from numpy import savez_compressed as npsavez
+from numpy.random import SeedSequence, default_rng
+from .cli import get_parser, translate
+from .compose_pop import compose_homogenous
+from .simul import simulate
+from .spread_simul import scenario_kw
+
+
+# Arguments that control the run, not the simulated scenario
+RUN_ARGS = ("graphical_visualization", "headless", "replicates", "workers",
+            "batch", "template", "checkpoint", "checkpoint_every", "resume",
+            "compare_policies", "log_format", "log_flush", "log_thread",
+            "trace", "frames", "frame_sample", "redraw_every", "max_fps",
+            "plot_sample", "seed", "param", "design", "samples", "output")
+# Summary of each simulation, columns of output
+METRICS = ("days", "peak_active", "peak_serious", "cases", "recovered",
+           "dead")
+
+
+def arg_types() -> dict:
+    '''Type of each simulation argument'''
+    return {action.dest: (action.type or type(action.default))
+            for action in get_parser()._actions if action.dest != "help"}
+
+
+def parse_axis(spec: str, types: dict) -> tuple:
+    '''"name=v1,v2,..." (values) or "name=low:high[:step]" (range)
+    name is that of a simulation argument, e.g. contacts, lockdown-chunk
+    Returns name, values (list) or (low, high) (tuple)
+    '''
+    name, _, values = spec.partition("=")
+    name = name.strip().lstrip("-").replace("-", "_")
+    if name not in types or name in RUN_ARGS:
+        raise ValueError("%s is not a simulation parameter" % name)
+    cast = types[name]
+    if cast is bool:
+        return name, [val.strip().lower() in ("1", "true", "yes")
+                      for val in values.split(",")]
+    if ":" not in values:
+        return name, [cast(val) for val in values.split(",")]
+    bounds = [float(val) for val in values.split(":")]
+    if len(bounds) == 3:
+        low, high, step = bounds
+        return name, [cast(val) for val in
+                      nparange(low, high + step / 2, step).tolist()]
+    return name, (bounds[0], bounds[1])
+
+
+def design(axes: dict, method: str="grid", samples: int=0,
+           seed: int=None) -> list:
+    '''Points (dicts) of parameter space
+    method: "grid": every combination of values (axes must be lists)
+    "lhs": latin hypercube, "sobol": Sobol sequence (needs scipy),
+    of "samples" points
+    '''
+    names = list(axes)
+    if method == "grid":
+        for name in names:
+            if isinstance(axes[name], tuple):
+                raise ValueError("Grid needs values or step for %s" % name)
+        return [dict(zip(names, values))
+                for values in product(*(axes[name] for name in names))]
+    if method == "lhs":
+        rng = default_rng(seed)
+        unit = (nparray([rng.permutation(samples) for _ in names]).T
+                + rng.random(size=(samples, len(names)))) / samples
+    elif method == "sobol":
+        try:
+            from scipy.stats import qmc
+        except ImportError:
+            raise ImportError("Sobol design needs scipy") from None
+        unit = qmc.Sobol(len(names), seed=seed).random(samples)
+    else:
+        raise ValueError("Unknown design %s" % method)
+    points = []
+    for row in unit:
+        point = {}
+        for name, frac in zip(names, row.tolist()):
+            axis = axes[name]
+            if isinstance(axis, tuple):
+                point[name] = axis[0] + frac * (axis[1] - axis[0])
+            else:
+                point[name] = axis[min(int(frac * len(axis)), len(axis) - 1)]
+        points.append(point)
+    return points
+
+
+def point_key(scenario: dict, seed: int, replicate: int) -> str:
+    '''Stable hash of scenario parameters, seed and replicate'''
+    scenario = {name: val for name, val in scenario.items()
+                if name not in RUN_ARGS}
+    return sha1(dumps([scenario, seed, replicate], sort_keys=True)
+                .encode()).hexdigest()[:16]
+
+
+def typed(point: dict, types: dict) -> dict:
+    '''Round sampled values of integer parameters'''
+    for name, val in point.items():
+        if types[name] is int:
+            point[name] = int(round(val))
+    return point
+
+
+def run_point(scenario: dict, key: str) -> tuple:
+    '''Simulate a point of parameter space, returns METRICS'''
+    compose_kw, simul_kw = scenario_kw(translate(Namespace(**scenario)))
+    city, simul_pop, _, _ = compose_homogenous(
+        seed=SeedSequence(int(key, 16)), **compose_kw)
+    track = simulate(city=city, logfile=None, simul_pop=simul_pop,
+                     **simul_kw).track
+    return (len(track) - 1, track[:, 0].max(), track[:, 3].max(),
+            track[-1, 2], track[-1, 1], track[-1, 4])
+
+
+def completed(output: str, names: list) -> tuple:
+    '''Keys of points present in output, seed of the sweep
+    A last row cut short (e.g. by a crash) is removed from output
+    '''
+    if not path.isfile(output):
+        return set(), None
+    with open(output, "rb+") as output_h:
+        text = output_h.read()
+        end = text.rfind(b"\n") + 1
+        if end < len(text):
+            output_h.truncate(end)
+    rows = [line.split("\t") for line in text[:end].decode().splitlines()]
+    if rows and rows[0] != ["key", "replicate", "seed", *names, *METRICS]:
+        raise ValueError("%s holds a sweep of other parameters" % output)
+    keys = set(row[0] for row in rows[1:])
+    seed = int(rows[1][2]) if len(rows) > 1 else None
+    return keys, seed
+
+
+def _column(values: list) -> nparray:
+    '''Text values of a column as integers, else floats, else text'''
+    for cast in (int, float):
+        try:
+            return nparray([cast(val) for val in values])
+        except ValueError:
+            pass
+    return nparray(values)
+
+
+def columnar(output: str) -> str:
+    '''Rows of the tab separated output as columns of a npz file (named
+    as output, with extension .npz), returns its name
+    '''
+    with open(output, "r") as output_h:
+        rows = [line.rstrip("\n").split("\t") for line in output_h]
+    names = rows[0]
+    columns = {name: _column([row[idx] for row in rows[1:]])
+               for idx, name in enumerate(names)}
+    filename = path.splitext(output)[0] + ".npz"
+    npsavez(filename, columns=nparray(names), **columns)
+    return filename
+
+
+def run_sweep(base: Namespace, axes: dict, output: str,
+              method: str="grid", samples: int=0, replicates: int=1,
+              workers: int=None, seed: int=None)-> None:
+    '''Simulate every point of the design in a pool of processes
+    Rows (key, replicate, seed, parameters, METRICS) are appended to the
+    tab separated "output" as they complete; points already present are
+    skipped, so that an interrupted sweep resumes
+    Finally, all rows are saved as columns (see columnar)
+    '''
+    names = list(axes)
+    done, done_seed = completed(output, names)
+    if seed is None:
+        seed = done_seed if done_seed is not None else\
+            SeedSequence().entropy % (1 << 63)
+    jobs = {}
+    for point in design(axes, method=method, samples=samples, seed=seed):
+        point = typed(point, arg_types())
+        scenario = dict(vars(base), **point)
+        for replicate in range(replicates):
+            key = point_key(scenario, seed, replicate)
+            if key not in done:
+                jobs[key] = (scenario, replicate, point)
+    new_file = not (path.isfile(output) and path.getsize(output))
+    with open(output, "a") as output_h,\
+         ProcessPoolExecutor(max_workers=workers) as pool:
+        if new_file:
+            print("key", "replicate", "seed", *names, *METRICS, sep="\t",
+                  file=output_h, flush=True)
+        futures = {pool.submit(run_point, dict(scenario), key): key
+                   for key, (scenario, _, _) in jobs.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            _, replicate, point = jobs[key]
+            print(key, replicate, seed, *(point[name] for name in names),
+                  *future.result(), sep="\t", file=output_h, flush=True)
+    columnar(output)
+    return
+
+
+def main():
+    '''Sweep command line: all simulation arguments set the base
+    scenario, --param (repeated) sweeps one of them
+    '''
+    parser = get_parser()
+    parser.description = "Sweep parameters of simulated spread"
+    sweep_args = parser.add_argument_group("sweep")
+    sweep_args.add_argument("--param", action="append", required=True,
+                            help="name=v1,v2,... or name=low:high[:step]")
+    sweep_args.add_argument("--design", default="grid",
+                            choices=("grid", "lhs", "sobol"),
+                            help="Points of parameter space to simulate")
+    sweep_args.add_argument("--samples", default=64, type=int,
+                            help="Points of lhs or sobol design")
+    sweep_args.add_argument("--output", default="sweep.tsv",
+                            help="Tab separated results, resumed if present"
+                            "; also saved as columns in a .npz file")
+    args = parser.parse_args()
+    axes = dict(parse_axis(spec, arg_types()) for spec in args.param)
+    run_sweep(args, axes, args.output, method=args.design,
+              samples=args.samples, replicates=args.replicates,
+              workers=args.workers, seed=args.seed)
+    return
+
+
+if __name__ == "__main__":
+    main()
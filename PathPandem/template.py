@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Frozen initial population, cloned for replicates'''
+
+
+from json import dump, load
+from os import path, makedirs
+from numpy import array as nparray
+from numpy import zeros as npzeros
+from numpy import int64 as npint64
+from numpy import float64 as npfloat64
+from numpy import save as npsave
+from numpy import load as npload
+from .pathogen import pathogen
+from .population import population
+from .rng import rng_streams
+
+
+# Person-wise columns of a population
+COLUMNS = ("active", "recovered", "susceptible", "vaccinated", "health",
+           "support", "support_days", "comorbidity", "progress",
+           "move_per_day", "strain", "cohort", "home", "rms_v", "cfr",
+           "inf_per_day", "uid")
+
+# Columns never written in place (death replaces them), shared by clones
+SHARED = ("comorbidity", "cohort", "uid")
+
+# Columns drawn afresh for each seed
+REDRAWN = ("home", )
+
+# Scalar attributes of a population
+SCALARS = ("pop_size", "p_max", "serious_health", "resist_def",
+           "infrastructure", "vac_resist", "vac_cov", "vac_priority",
+           "triage", "debug", "n_active", "n_recovered", "n_serious",
+           "n_dead", "next_uid")
+
+# Parameters of each strain
+STRAIN_PARAMS = ("cfr", "inf_per_day", "inf_per_exp", "persistence")
+
+
+def strain_params(strain_types: list) -> nparray:
+    '''Parameters of strains: strain x STRAIN_PARAMS (Null strain omitted)'''
+    return nparray([[getattr(pathy, param) for param in STRAIN_PARAMS]
+                    for pathy in strain_types[1:]],
+                   dtype=npfloat64).reshape((-1, len(STRAIN_PARAMS)))
+
+
+def make_strains(params: nparray) -> list:
+    '''Pathogens from strain_params, preceded by the Null strain'''
+    strains: list = [None]
+    for row in params.tolist():
+        pathy = pathogen.__new__(pathogen)
+        for param, value in zip(STRAIN_PARAMS, row):
+            setattr(pathy, param, value)
+        pathy.persistence = int(pathy.persistence)
+        strains.append(pathy)
+    return strains
+
+
+class population_template(object):
+    '''Initial population, frozen: its arrays are read-only'''
+    def __init__(self, columns: dict, scalars: dict, cohort_types: list,
+                 cohort_dead: nparray, strains: nparray, key: str=None)-> None:
+        self.columns = columns  # name: array
+        self.scalars = scalars  # name: value
+        self.cohort_types = cohort_types
+        self.cohort_dead = cohort_dead
+        self.strains = strains  # strain_params
+        self.key = key  # Hash of inputs that composed the population
+        for array in (*columns.values(), cohort_dead, strains):
+            array.flags.writeable = False
+        return
+
+    def clone(self, seed: int=None) -> population:
+        '''Population ready to simulate with its own random streams
+        Only mutable columns are copied, REDRAWN columns are drawn from seed
+        as compose_homogenous would have drawn them
+        '''
+        rng = rng_streams(seed)
+        city = population(p_max=0, rng=rng)
+        for name, value in self.scalars.items():
+            setattr(city, name, value)
+        for name, column in self.columns.items():
+            if name not in SHARED:
+                column = column.copy()
+            setattr(city, name, column)
+        # Drawn as compose_homogenous draws them: its prototype person's
+        # home first, so that a clone is the population composed with seed
+        city.home = rng.composition.integers(
+            city.p_max, size=(city.pop_size + 1, 2))[1:]
+        city.cohort_types = list(self.cohort_types)
+        city.cohort_dead = self.cohort_dead.copy()
+        city.strain_types = make_strains(self.strains)
+        city.space_contam = npzeros((city.p_max, city.p_max), dtype=npint64)
+        city.space_dep_strain = npzeros((city.p_max, city.p_max),
+                                        dtype=npint64)
+        return city
+
+    def save(self, directory: str)-> None:
+        '''A .npy file per array (memory-mappable), json of the rest'''
+        makedirs(directory, exist_ok=True)
+        for name, column in self.columns.items():
+            npsave(path.join(directory, name + ".npy"), column)
+        npsave(path.join(directory, "cohort_dead.npy"), self.cohort_dead)
+        npsave(path.join(directory, "strains.npy"), self.strains)
+        with open(path.join(directory, "template.json"), "w") as meta:
+            dump({"scalars": self.scalars, "cohort_types": self.cohort_types,
+                  "key": self.key}, meta)
+        return
+
+
+def freeze(city: population, key: str=None) -> population_template:
+    '''Template of a composed population, before any day is passed'''
+    def plain(value):
+        return value.item() if hasattr(value, "item") else value
+    return population_template(
+        columns={name: getattr(city, name).copy() for name in COLUMNS
+                 if name not in REDRAWN},
+        scalars={name: plain(getattr(city, name)) for name in SCALARS},
+        cohort_types=list(city.cohort_types),
+        cohort_dead=city.cohort_dead.copy(),
+        strains=strain_params(city.strain_types), key=key,
+    )
+
+
+def load_template(directory: str,
+                  mmap_mode: str="r") -> population_template:
+    '''Saved template, arrays are memory-mapped (shared page cache)'''
+    with open(path.join(directory, "template.json")) as meta:
+        saved = load(meta)
+    columns = {name: npload(path.join(directory, name + ".npy"),
+                            mmap_mode=mmap_mode)
+               for name in COLUMNS if name not in REDRAWN}
+    return population_template(
+        columns=columns, scalars=saved["scalars"],
+        cohort_types=saved["cohort_types"],
+        cohort_dead=npload(path.join(directory, "cohort_dead.npy")),
+        strains=npload(path.join(directory, "strains.npy")),
+        key=saved["key"],
+    )
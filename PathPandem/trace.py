@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Trace of infection events'''
+
+
+from os import path
+from numpy import dtype as npdtype
+from numpy import full as npfull
+from numpy import int64 as npint64
+from numpy import memmap as npmemmap
+from numpy import nonzero as npnonzero
+from numpy import searchsorted as npsearchsorted
+from numpy import zeros as npzeros
+
+
+# Kinds of events, the "event" field of a record
+EVENTS = ("infection", "mutation", "support", "recovery", "death")
+INFECTION, MUTATION, SUPPORT, RECOVERY, DEATH = range(len(EVENTS))
+
+# Fixed-size record: "source" is uid of the person who contaminated the
+# cell (x, y) of infection, -1 where unknown or not applicable
+TRACE_DTYPE = npdtype([("day", "<i4"), ("event", "u1"), ("uid", "<i8"),
+                       ("source", "<i8"), ("x", "<i4"), ("y", "<i4"),
+                       ("strain", "<i4")])
+
+
+class event_trace(object):
+    '''Events of a day in a preallocated buffer, appended to a binary file
+    at the end of the day
+    "mutation" is an infection by a strain that mutated in it
+    '''
+    def __init__(self, filename: str, capacity: int=4096,
+                 resume_day: int=None)-> None:
+        '''filename: created afresh, read back with read_trace
+        resume_day: continue the trace of a simulation resumed on this day
+        instead, records of later days (written after the checkpoint) are
+        dropped
+        '''
+        self.filename = filename
+        self.buffer = npzeros(capacity, dtype=TRACE_DTYPE)
+        self.size: int = 0  # Records buffered
+        self.day: int = 0 if resume_day is None else resume_day
+        self.resumed = resume_day is not None
+        self.depositor = npfull((0, 0), -1, dtype=npint64)
+        if not (self.resumed and path.isfile(filename)):
+            open(filename, "wb").close()
+            return
+        # Records are in order of days
+        kept = int(npsearchsorted(read_trace(filename)["day"], resume_day,
+                                  side="right"))
+        with open(filename, "r+b") as trace_h:
+            trace_h.truncate(kept * TRACE_DTYPE.itemsize)
+        return
+
+    def attach(self, city)-> None:
+        '''Trace city: active persons are recorded as infected today
+        (by unknown source), unless the trace is resumed
+        '''
+        self.depositor = npfull((city.p_max, city.p_max), -1, dtype=npint64)
+        city.trace = self
+        if self.resumed:
+            return  # Founders are in the trace already
+        founders = npnonzero(city.active)[0]
+        self.log(INFECTION, city.uid[founders], city.strain[founders])
+        return
+
+    def reserve(self, num: int)-> None:
+        '''Room for num more records, flushing (or growing) the buffer'''
+        if self.size + num <= self.buffer.size:
+            return
+        self.flush()
+        if num > self.buffer.size:
+            self.buffer = npzeros(num, dtype=TRACE_DTYPE)
+        return
+
+    def infect(self, event: int, uid: int, strain: int, x_pos: int,
+               y_pos: int)-> None:
+        '''Infection of a person at a cell'''
+        self.reserve(1)
+        self.buffer[self.size] = (self.day, event, uid,
+                                  self.depositor[x_pos, y_pos], x_pos, y_pos,
+                                  strain)
+        self.size += 1
+        return
+
+    def log(self, event: int, uid, strain)-> None:
+        '''Same event for arrays of persons, position unknown'''
+        num = len(uid)
+        if not num:
+            return
+        self.reserve(num)
+        records = self.buffer[self.size:self.size + num]
+        records["day"] = self.day
+        records["event"] = event
+        records["uid"] = uid
+        records["source"] = -1
+        records["x"] = -1
+        records["y"] = -1
+        records["strain"] = strain
+        self.size += num
+        return
+
+    def flush(self)-> None:
+        '''Append buffered records to file'''
+        if self.size:
+            with open(self.filename, "ab") as trace_h:
+                self.buffer[:self.size].tofile(trace_h)
+            self.size = 0
+        return
+
+
+def read_trace(filename: str) -> npmemmap:
+    '''Records of a trace file, memory-mapped'''
+    if not path.getsize(filename):
+        return npzeros(0, dtype=TRACE_DTYPE)  # Empty files can't be mapped
+    return npmemmap(filename, dtype=TRACE_DTYPE, mode="r")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Track infection trends'''
+
+
+from numpy import array as nparray
+from numpy import zeros as npzeros
+from numpy import int64 as npint64
+from numpy import savez as npsavez
+from numpy import load as npload
+from numpy import loadtxt as nploadtxt
+
+
+# Columns of a survey row
+SURVEY_COLUMNS = ("Active", "Recovered", "Cases", "Serious", "Dead")
+
+
+class trajectory(object):
+    '''Daily survey rows in a preallocated, geometrically grown buffer'''
+    def __init__(self, columns: int=len(SURVEY_COLUMNS),
+                 capacity: int=256)-> None:
+        self.size: int = 0  # Rows filled
+        self.buffer: nparray = npzeros((capacity, columns), dtype=npint64)
+        return
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, row: tuple)-> None:
+        '''Add a day's survey, doubling the buffer when full'''
+        if self.size == self.buffer.shape[0]:
+            grown = npzeros((2 * self.buffer.shape[0], self.buffer.shape[1]),
+                            dtype=self.buffer.dtype)
+            grown[:self.size] = self.buffer
+            self.buffer = grown
+        self.buffer[self.size] = row
+        self.size += 1
+        return
+
+    @property
+    def rows(self) -> nparray:
+        '''View of filled rows: day x column'''
+        return self.buffer[:self.size]
+
+
+class simul_result(object):
+    '''Outcome of a simulation'''
+    def __init__(self, track: nparray=None, vaccine_discovery_date: int=0,
+                 drug_discovery_date: int=0, lockdowns: list=None,
+                 days: int=0, elapsed: float=0.,
+                 fast_forwarded: list=None)-> None:
+        self.track = track  # Survey row of each day, SURVEY_COLUMNS
+        self.vaccine_discovery_date = vaccine_discovery_date
+        self.drug_discovery_date = drug_discovery_date
+        self.lockdowns: list = lockdowns or []  # (start, end) days
+        self.days = days  # Days simulated
+        self.elapsed = elapsed  # Wall-clock seconds
+        # Days on which nobody was active, walks were fast-forwarded
+        self.fast_forwarded: list = fast_forwarded or []
+        return
+
+    def save(self, filehandle)-> None:
+        '''Arrays in npz, open lockdown ends are -1'''
+        lockdowns = nparray(
+            [(start, -1 if end is None else end)
+             for start, end in self.lockdowns], dtype=npint64
+        ).reshape((-1, 2))
+        npsavez(filehandle, track=self.track, lockdowns=lockdowns,
+                dates=nparray((self.vaccine_discovery_date,
+                               self.drug_discovery_date, self.days)),
+                elapsed=nparray(self.elapsed),
+                fast_forwarded=nparray(self.fast_forwarded, dtype=npint64))
+        return
+
+
+def load_result(filehandle) -> simul_result:
+    '''simul_result saved in npz'''
+    with npload(filehandle) as saved:
+        vaccine, drug, days = saved["dates"].tolist()
+        return simul_result(
+            track=saved["track"], vaccine_discovery_date=vaccine,
+            drug_discovery_date=drug, days=days,
+            lockdowns=[(start, None if end < 0 else end)
+                       for start, end in saved["lockdowns"].tolist()],
+            elapsed=float(saved["elapsed"]),
+            fast_forwarded=(saved["fast_forwarded"].tolist()
+                            if "fast_forwarded" in saved else []),
+        )
+
+
+def load_track(filename: str) -> nparray:
+    '''Survey rows (day x SURVEY_COLUMNS) of a text log (header optional),
+    or of a npz holding "track" (saved result or npz log)
+    '''
+    if filename.endswith(".npz"):
+        with npload(filename) as saved:
+            return saved["track"]
+    with open(filename, "r") as log_h:
+        header = not log_h.readline().split()[0].lstrip("-").isdigit()
+    return nploadtxt(filename, dtype=npint64, skiprows=int(header),
+                     ndmin=2)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#
+# Copyright 2020 Pradyumna Paranjape
+# This file is part of PathPandem.
+#
+# PathPandem is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PathPandem is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PathPandem.  If not, see <https://www.gnu.org/licenses/>.
+'''Vaccination'''
+
+
+from numpy import array as nparray
+from numpy import append as npappend
+from numpy import intp as npintp
+from numpy import nonzero as npnonzero
+from numpy import searchsorted as npsearchsorted
+
+
+class vac_scheduler(object):
+    '''Queue of unvaccinated persons, vaccinated in daily batches'''
+    def __init__(self, city, vac_resist: float=0, vac_cov: float=0,
+                 priority: str="random")-> None:
+        '''Queue everybody who isn't vaccinated yet
+        priority: "random", "vulnerable" (comorbid first)
+        or "susceptible" (most susceptible first)
+        '''
+        self.vac_resist = vac_resist  # Resistance gained by vaccination
+        self.vac_cov = vac_cov  # Fraction of population dosed per day
+        self.doses_left: float = 0.  # Fraction of a dose carried over
+        queue = npnonzero(~city.vaccinated)[0]
+        # Random order breaks ties of every priority rule
+        queue = queue[city.rng.vaccination.permutation(queue.size)]
+        if priority == "vulnerable":
+            queue = queue[(-city.comorbidity[queue]).argsort(kind="stable")]
+        elif priority == "susceptible":
+            queue = queue[(-city.susceptible[queue]).argsort(kind="stable")]
+        self.queue: nparray = nparray(queue, dtype=npintp)
+        self.head: int = 0  # Next in queue
+        return
+
+    def enqueue(self, idx: int)-> None:
+        '''Newly added person waits at the end of the queue'''
+        self.queue = npappend(self.queue, idx)
+        return
+
+    def remove(self, idx)-> None:
+        '''Forget removed persons and shift the rest to new indices'''
+        idx = nparray(idx, dtype=npintp)
+        idx.sort()
+        if not idx.size:
+            return
+        waiting = self.queue[self.head:]
+        shift = npsearchsorted(idx, waiting)
+        gone = idx[shift.clip(max=idx.size - 1)] == waiting
+        self.queue = waiting[~gone] - shift[~gone]
+        self.head = 0
+        return
+
+    def vaccinate(self, city)-> None:
+        '''Dose the next persons in queue, as many as today's budget'''
+        self.doses_left += self.vac_cov * city.pop_size
+        doses = int(self.doses_left)
+        self.doses_left -= doses
+        batch = self.queue[self.head:self.head + doses]
+        self.head += batch.size
+        city.vaccinated[batch] = True
+        city.susceptible[batch] = (
+            city.susceptible[batch] - self.vac_resist).clip(min=0)
+        return
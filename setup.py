@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 # -*- coding:utf-8 -*-
 
+from runpy import run_path
 from setuptools import setup
 
 with open("./LongDescription", 'r') as README_FILE:
     long_description = README_FILE.read()
 
+# Single source of the version, also a part of cache keys
+VERSION = run_path("./PathPandem/definitions.py")["VERSION"]
+
 setup(
     name='PathPandem',
-    version='1.0.2.3',
+    version=VERSION,
     description='Simulate Pandemic Pathogen Outbreak',
     license="GPLv3",
     long_description=long_description,
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Tests import PathPandem from this checkout'''
+
+
+from os import path
+import sys
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
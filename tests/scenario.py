@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Scenarios shared by tests'''
+
+
+from PathPandem.cli import get_parser, translate
+from PathPandem.compose_pop import compose_homogenous
+from PathPandem.simul import simulation, resume
+from PathPandem.spread_simul import scenario_kw
+
+
+def small_scenario(*args) -> tuple:
+    '''compose and simulation arguments of a small, short epidemic
+    args: command line options, override defaults
+    '''
+    return scenario_kw(translate(get_parser().parse_args(
+        ["-P", "300", "-D", "0.003", "-S", "5", "--max-days", "15",
+         *args])))
+
+
+def small_simulation(seed: int, **kwargs) -> simulation:
+    '''Simulation of a small scenario, till the epidemic ends
+    kwargs: of simulation, e.g. logfile, trace, frames
+    '''
+    compose_kw, simul_kw = small_scenario()
+    simul_kw["max_days"] = None
+    city, simul_pop, _, _ = compose_homogenous(seed=seed, **compose_kw)
+    return simulation(city=city, simul_pop=simul_pop, **simul_kw, **kwargs)
+
+
+def interrupted(checkpoint: str, seed: int, resumed_kw: dict=None,
+                days: int=6, lost: int=3, **kwargs):
+    '''simul_result of a small simulation checkpointed after "days", run
+    "lost" days more (as if killed before the next checkpoint), resumed
+    from the checkpoint and run till the end
+    kwargs: of the simulation, resumed_kw: of resume, or a function
+    returning them after the lost days
+    '''
+    sim = small_simulation(seed, **kwargs)
+    sim.run(days=days)
+    sim.checkpoint(checkpoint)
+    sim.run(days=lost)
+    if callable(resumed_kw):
+        resumed_kw = resumed_kw()
+    return resume(checkpoint, **(resumed_kw or {})).run()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Replicates vectorized along a leading axis'''
+
+
+import sys
+import pytest
+from PathPandem.batch import batch_population, batch_simulation
+from PathPandem.compose_pop import compose_homogenous
+from PathPandem.ensemble import run_ensemble
+from PathPandem.spread_simul import main
+from scenario import small_scenario
+
+
+def test_batch_tracks_add_up():
+    compose_kw, simul_kw = small_scenario("-C", "25")
+    city, simul_pop, _, _ = compose_homogenous(seed=5, **compose_kw)
+    batch = batch_population(city, replicates=4)
+    tracks = batch_simulation(city=batch, **simul_kw).run()
+    assert len(tracks) == 4
+    for track in tracks:
+        assert track.ndim == 2 and track.shape[1] == 5
+        active, recovered, cases, serious, dead = track.T
+        assert (cases == active + recovered + dead).all()
+        assert (cases <= simul_pop).all() and (serious <= active).all()
+        assert (dead[1:] >= dead[:-1]).all()
+    assert (batch.alive.sum(axis=1) + batch.n_dead == simul_pop).all()
+
+
+def test_batch_means_match_scalar_means():
+    compose_kw, simul_kw = small_scenario("-C", "25")
+    scalar, batched = (run_ensemble(compose_kw, simul_kw, replicates=16,
+                                    workers=1, seed=2, batch=batch)
+                       for batch in (0, 16))
+    assert scalar.mean.shape == batched.mean.shape
+    cases = scalar.mean[-1, 2]
+    assert cases > 20
+    assert abs(batched.mean[-1, 2] - cases) < 0.25 * cases
+
+
+@pytest.mark.parametrize("option", ("--trace", "--frames", "--checkpoint"))
+def test_replicates_reject_recordings(monkeypatch, tmp_path, option):
+    monkeypatch.setitem(sys.modules, "gooey", None)  # Plain command line
+    monkeypatch.setattr(sys, "argv", [
+        "PathPandem", "--headless", "--replicates", "2", "--batch", "2",
+        option, str(tmp_path / "recording")])
+    with pytest.raises(SystemExit) as stopped:
+        main()
+    assert stopped.value.code == 1
+    assert not list(tmp_path.iterdir())
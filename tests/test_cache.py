@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Cache of simulation results'''
+
+
+from os import path
+from PathPandem import cache
+from PathPandem.cache import result_cache, result_key
+from PathPandem.track import simul_result
+from scenario import small_scenario
+
+
+def test_repeated_scenario_hits(tmp_path, monkeypatch):
+    results = result_cache(str(tmp_path))
+    compose_kw, simul_kw = small_scenario()
+    first = results.simulate(compose_kw, simul_kw, seed=3)
+
+    def unexpected(**kwargs):
+        raise AssertionError("simulated again")
+
+    monkeypatch.setattr(cache, "simulate", unexpected)
+    again = results.simulate(compose_kw, simul_kw, seed=3)
+    assert again.track.tolist() == first.track.tolist()
+    assert again.lockdowns == first.lockdowns
+    key = result_key(compose_kw, simul_kw, 3)
+    assert results.index.execute("SELECT hits FROM results WHERE key = ?",
+                                 (key, )).fetchone() == (1, )
+    assert [found for found, _ in results.query(seed=3)] == [key]
+    assert results.query(compose={"simul_pop": 300}, seed=3)
+    assert not results.query(seed=4)
+
+
+def test_changed_parameter_misses(tmp_path):
+    results = result_cache(str(tmp_path))
+    compose_kw, simul_kw = small_scenario()
+    results.simulate(compose_kw, simul_kw, seed=3)
+    changed_kw, _ = small_scenario("-C", "20")
+    assert result_key(changed_kw, simul_kw, 3)\
+        != result_key(compose_kw, simul_kw, 3)
+    assert results.get(result_key(changed_kw, simul_kw, 3)) is None
+    assert results.get(result_key(compose_kw, simul_kw, 4)) is None
+    assert results.get(result_key(compose_kw, simul_kw, 3)) is not None
+
+
+def test_eviction_keeps_size_limit(tmp_path):
+    results = result_cache(str(tmp_path), max_bytes=1 << 40)
+    track = [(day, 0, day, 0, 0) for day in range(100)]
+    for key in "abc":
+        results.put(key, simul_result(track=track))
+    size = path.getsize(results.filename("a"))
+    results.max_bytes = 2 * size
+    results.get("a")  # b is now least recently used
+    results.put("d", simul_result(track=track))
+    assert "b" not in results and not path.exists(results.filename("b"))
+    assert "c" not in results
+    assert "a" in results and "d" in results
+    total = results.index.execute("SELECT SUM(size) FROM results")
+    assert total.fetchone()[0] <= results.max_bytes
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Command line to simulation parameters'''
+
+
+from PathPandem.cli import get_parser, translate
+
+
+def test_parameters_are_named():
+    params = translate(get_parser().parse_args(
+        ["-P", "800", "-F", "10", "-M", "80", "-i", "--seed", "4",
+         "--log-format", "npz"]))
+    assert params.simul_pop == 800 and params.feeble_prop == 0.1
+    assert abs(params.med_eff - 0.2) < 1e-12
+    assert params.intervention and not params.early_action
+    assert (params.seed, params.log_format, params.log_flush)\
+        == (4, "npz", None)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Schedule of medical discoveries'''
+
+
+from json import dump
+from PathPandem.discovery import (random_discovery, fixed_discovery,
+                                  scenario_discovery)
+from PathPandem.rng import rng_streams
+
+
+def dates(discovery, seed: int=3) -> tuple:
+    '''Discovery dates drawn from a seeded stream'''
+    return discovery.dates(rng_streams(seed).discovery)
+
+
+def test_seeded_dates_reproduce():
+    drawn = dates(random_discovery(rate=0.01))
+    assert drawn == dates(random_discovery(rate=0.01))
+    assert all(isinstance(day, int) and day >= 1 for day in drawn)
+    assert len({dates(random_discovery(rate=0.01), seed)
+                for seed in range(8)}) > 1
+
+
+def test_fixed_days():
+    assert dates(fixed_discovery(vaccine=30, drug=12)) == (30, 12)
+    # Unknown day is drawn as it would be without the fixed one
+    vaccine, drug = dates(random_discovery(rate=0.01))
+    assert dates(fixed_discovery(vaccine=30, rate=0.01)) == (30, drug)
+    assert dates(fixed_discovery(drug=12, rate=0.01)) == (vaccine, 12)
+
+
+def test_scenario_file(tmp_path):
+    scenario = str(tmp_path / "scenario.json")
+    with open(scenario, "w") as scenario_h:
+        dump({"vaccine": 45}, scenario_h)
+    discovery = scenario_discovery(scenario, rate=0.01)
+    _, drug = dates(random_discovery(rate=0.01))
+    assert dates(discovery) == (45, drug)
+    with open(scenario, "w") as scenario_h:
+        dump({"vaccine": 45, "drug": 7}, scenario_h)
+    assert dates(scenario_discovery(scenario)) == (45, 7)
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Replicates and policies on common random numbers'''
+
+
+import pytest
+from numpy.random import SeedSequence
+from PathPandem.ensemble import run_policies
+from PathPandem.rng import rng_streams
+from scenario import small_scenario
+
+
+def test_streams_leave_seed_unchanged():
+    seed_seq = SeedSequence(7)
+    first = rng_streams(seed_seq).mobility.random(4)
+    assert seed_seq.n_children_spawned == 0
+    assert (rng_streams(seed_seq).mobility.random(4) == first).all()
+
+
+@pytest.mark.parametrize("workers", (1, 2))
+def test_identical_policies_identical_tracks(workers):
+    compose_kw, simul_kw = small_scenario()
+    result = run_policies(compose_kw, simul_kw, replicates=3,
+                          workers=workers, seed=11,
+                          policies={"A": {}, "B": {}}, baseline="A")
+    assert (result.lengths[0] == result.lengths[1]).all()
+    assert not result.diff_mean.any()
+    assert (result.final[0] == result.final[1]).all()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Recorder of daily spatial frames'''
+
+
+from PathPandem.frames import frame_recorder, read_frames
+from scenario import small_simulation, interrupted
+
+
+def decoded(filename: str) -> list:
+    '''Frames as comparable lists'''
+    return [{key: getattr(value, "tolist", lambda: value)()
+             for key, value in frame.items()}
+            for frame in read_frames(filename)]
+
+
+def test_resumed_recording_continues(tmp_path):
+    # Recorded in chunks of 4 days
+    whole = str(tmp_path / "whole.zip")
+    small_simulation(9, frames=frame_recorder(whole, sample=50,
+                                              chunk=4)).run()
+    parts = str(tmp_path / "parts.zip")
+    interrupted(str(tmp_path / "checkpoint.npz"), 9, lost=5,
+                frames=frame_recorder(parts, sample=50, chunk=4),
+                resumed_kw={"frames": frame_recorder(parts, chunk=4)})
+    expected = decoded(whole)
+    assert len(expected) > 11
+    assert decoded(parts) == expected
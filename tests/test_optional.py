@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Core runs without optional dependencies (matplotlib, gooey)'''
+
+
+from os import path
+import subprocess
+import sys
+
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+
+SCRIPT = """
+import sys
+for name in ("matplotlib", "matplotlib.pyplot", "gooey"):
+    sys.modules[name] = None  # import fails
+sys.path[:0] = [%r, %r]
+import PathPandem
+from PathPandem.cli import cli, get_parser, translate
+from PathPandem.compose_pop import compose_homogenous
+from PathPandem.simul import simulate
+from scenario import small_scenario
+sys.argv = ["PathPandem"]
+assert cli() == translate(get_parser().parse_args([]))  # Without Gooey
+compose_kw, simul_kw = small_scenario()
+city, simul_pop, _, _ = compose_homogenous(seed=3, **compose_kw)
+result = simulate(city=city, logfile=None, simul_pop=simul_pop, **simul_kw)
+assert len(result.track) > 1
+assert not any(name.startswith("matplotlib") and sys.modules[name]
+               for name in sys.modules)
+print("ok")
+""" % (ROOT, path.join(ROOT, "tests"))
+
+
+def test_core_without_matplotlib_and_gooey():
+    done = subprocess.run([sys.executable, "-c", SCRIPT],
+                          capture_output=True, text=True)
+    assert done.returncode == 0, done.stderr
+    assert done.stdout.strip() == "ok"
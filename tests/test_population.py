@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Population bearing disease spread'''
+
+
+from numpy import array as nparray
+from PathPandem.population import population
+from PathPandem.rng import rng_streams
+
+
+def short_of_beds(triage: str, seed: int=1) -> population:
+    '''Eight persons, five on life support, three beds'''
+    city = population(pop_size=8, p_max=4, infrastructure=3, triage=triage,
+                      rng=rng_streams(seed))
+    city.support[:5] = True
+    city.health[:] = nparray([0.2, 0.05, 0.25, 0.1, 0.15, 0.01, 0.9, 1.])
+    city.support_days[:] = nparray([1, 4, 2, 6, 3, 9, 0, 0])
+    return city
+
+
+def test_severity_gives_beds_to_least_healthy():
+    dead = short_of_beds("severity").triage_dead()
+    assert dead.tolist() == [True, False, True, False, False, False, False,
+                             False]
+
+
+def test_fcfs_keeps_longest_supported():
+    dead = short_of_beds("fcfs").triage_dead()
+    assert dead.tolist() == [True, False, True, False, False, False, False,
+                             False]
+    city = short_of_beds("fcfs")
+    city.support_days[:5] = [5, 1, 2, 3, 4]
+    assert city.triage_dead().nonzero()[0].tolist() == [1, 2]
+
+
+def test_random_triage_is_seeded():
+    picks = set()
+    for seed in range(8):
+        dead = short_of_beds("random", seed).triage_dead()
+        assert dead.sum() == 2 and not dead[5:].any()
+        assert (short_of_beds("random", seed).triage_dead() == dead).all()
+        picks.add(tuple(dead.nonzero()[0]))
+    assert len(picks) > 1
+
+
+def test_enough_beds_nobody_dies():
+    city = short_of_beds("severity")
+    city.infrastructure = 5
+    assert not city.triage_dead().any()
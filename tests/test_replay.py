@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Replay of a recorded simulation (off-screen, Agg)'''
+
+
+from os import path
+import pytest
+from PathPandem.frames import frame_recorder, read_frames
+from PathPandem.sink import open_sink
+from scenario import small_simulation
+
+
+def test_replay_renders_every_frame(tmp_path):
+    pytest.importorskip("matplotlib")
+    from matplotlib.image import imread
+    from PathPandem.replay import replay
+    log = str(tmp_path / "spread.log")
+    frames = str(tmp_path / "frames.zip")
+    with open_sink(log) as log_h:
+        small_simulation(6, logfile=log_h, frames=frame_recorder(
+            frames, sample=50, chunk=4)).run()
+    days = [frame["day"] for frame in read_frames(frames)]
+    assert len(days) > 4  # More than a chunk
+    output = str(tmp_path / "replay")
+    pngs = replay(log, frames=frames, output=output, workers=1, dpi=20)
+    assert pngs == [path.join(output, "frame_%06d.png" % day)
+                    for day in days]
+    assert all(path.isfile(png) for png in pngs)
+    # Epidemic curve and contamination map side by side: 12 x 6 inches
+    assert imread(pngs[-1]).shape[:2] == (120, 240)
+    curve = replay(log, output=output, dpi=20)
+    assert curve == [path.join(output, "epidemic.png")]
+    assert imread(curve[0]).shape[:2] == (120, 120)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Day-by-day simulation'''
+
+
+from PathPandem.compose_pop import compose_homogenous
+from PathPandem.simul import simulate
+from scenario import small_scenario, small_simulation, interrupted
+
+
+def run(fast_forward: str, seed: int=5, **kwargs):
+    '''Result of a small scenario'''
+    compose_kw, simul_kw = small_scenario(*kwargs.pop("args", ()))
+    simul_kw.update(fast_forward=fast_forward, max_days=None, **kwargs)
+    city, simul_pop, _, _ = compose_homogenous(seed=seed, **compose_kw)
+    return simulate(city=city, logfile=None, simul_pop=simul_pop,
+                    **simul_kw)
+
+
+def test_exact_fast_forward_changes_nothing():
+    for seed in (5, 6):
+        off, exact = run("off", seed), run("exact", seed)
+        assert (off.track == exact.track).all()
+        assert off.lockdowns == exact.lockdowns
+        assert not off.fast_forwarded
+        assert exact.fast_forwarded
+        assert exact.fast_forwarded[-1] == len(exact.track) - 2
+
+
+def test_resume_continues_exactly(tmp_path):
+    expected = small_simulation(4).run()
+    resumed = interrupted(str(tmp_path / "checkpoint.npz"), 4, days=5,
+                          lost=4)
+    assert len(expected.track) > 9
+    assert resumed.track.tolist() == expected.track.tolist()
+    assert resumed.lockdowns == expected.lockdowns
+    assert resumed.days == expected.days
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Destinations of daily survey rows'''
+
+
+from os import path
+import pytest
+from PathPandem.sink import open_sink, npz_sink, threaded_sink, sink
+from PathPandem.track import load_track
+from scenario import small_simulation, interrupted
+
+
+ROWS = [(day, 2 * day, 3 * day, 0, 1) for day in range(50)]
+
+
+@pytest.mark.parametrize("log_format", ("text", "npz", "parquet"))
+def test_resumed_log_continues(tmp_path, log_format):
+    if log_format == "parquet":
+        pytest.importorskip("pyarrow")
+    filename = str(tmp_path / ("log." + log_format))
+    with open_sink(filename, log_format=log_format) as log_h:
+        for row in ROWS[:20]:
+            log_h.write(row)
+    with open_sink(filename, log_format=log_format, append=True) as log_h:
+        for row in ROWS[20:]:
+            log_h.write(row)
+    if log_format == "parquet":
+        from pyarrow import parquet
+        saved = parquet.read_table(filename).to_pandas().values
+    else:
+        saved = load_track(filename)
+    assert saved.tolist() == [list(row) for row in ROWS]
+
+
+@pytest.mark.parametrize("log_format", ("text", "npz"))
+def test_resumed_simulation_drops_lost_days(tmp_path, log_format):
+    whole = str(tmp_path / ("whole." + log_format))
+    with open_sink(whole, log_format=log_format) as log_h:
+        expected = small_simulation(5, logfile=log_h).run().track
+    parts = str(tmp_path / ("parts." + log_format))
+    logs = [open_sink(parts, log_format=log_format)]
+
+    def reopened() -> dict:
+        '''Log of lost days on disk, continued'''
+        logs[0].close()
+        logs.append(open_sink(parts, log_format=log_format, append=True))
+        return {"logfile": logs[1]}
+
+    interrupted(str(tmp_path / "checkpoint.npz"), 5, logfile=logs[0],
+                resumed_kw=reopened)
+    logs[1].close()
+    assert load_track(whole).tolist() == expected.tolist()
+    assert load_track(parts).tolist() == expected.tolist()
+
+
+def test_npz_written_on_sync_only(tmp_path):
+    filename = str(tmp_path / "log.npz")
+    log_h = npz_sink(filename, flush_every=1)
+    for row in ROWS[:10]:
+        log_h.write(row)
+    assert not path.exists(filename)
+    log_h.sync()
+    assert len(load_track(filename)) == 10
+    for row in ROWS[10:]:
+        log_h.write(row)
+    log_h.close()
+    assert len(load_track(filename)) == len(ROWS)
+
+
+class failing_sink(sink):
+    '''Fails on the first row'''
+    def buffer(self, row: tuple)-> None:
+        raise OSError("disk full")
+
+
+def test_threaded_sink_raises_instead_of_blocking():
+    log_h = threaded_sink(failing_sink(), queue_size=2)
+    with pytest.raises(OSError):
+        for row in ROWS * 10:
+            log_h.write(row)
+            log_h.flush()
+    with pytest.raises(OSError):
+        log_h.sync()
+    with pytest.raises(OSError):
+        log_h.close()
+
+
+def test_flush_defaults_of_formats(tmp_path):
+    text_h = open_sink(str(tmp_path / "log.log"))
+    npz_h = open_sink(str(tmp_path / "log.npz"), log_format="npz")
+    assert (text_h.flush_every, npz_h.flush_every) == (1, 0)
+    text_h.close()
+    npz_h.close()
+    with open_sink(str(tmp_path / "log.log"), flush_every=7) as log_h:
+        assert log_h.flush_every == 7
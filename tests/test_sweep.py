@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Sweep simulation parameters'''
+
+
+from numpy import load as npload
+from PathPandem.cli import get_parser
+from PathPandem.sweep import run_sweep, completed, METRICS
+
+
+def test_sweep_resumes_after_partial_row(tmp_path):
+    output = str(tmp_path / "sweep.tsv")
+    base = get_parser().parse_args(["-P", "200", "-D", "0.003", "-S", "5",
+                                    "--max-days", "5"])
+    axes = {"contacts": [10, 20]}
+    run_sweep(base, axes, output, workers=1, seed=3)
+    with open(output, "r") as output_h:
+        lines = output_h.readlines()
+    assert len(lines) == 3
+    # Crash while writing the last row
+    with open(output, "w") as output_h:
+        output_h.writelines(lines[:2] + [lines[2][:10]])
+    keys, seed = completed(output, list(axes))
+    assert seed == 3 and len(keys) == 1
+    run_sweep(base, axes, output, workers=1, seed=3)
+    with open(output, "r") as output_h:
+        resumed = output_h.readlines()
+    assert sorted(resumed) == sorted(lines)
+    with npload(str(tmp_path / "sweep.npz")) as saved:
+        assert list(saved["columns"]) == ["key", "replicate", "seed",
+                                          "contacts", *METRICS]
+        assert sorted(saved["contacts"].tolist()) == [10, 20]
+        assert saved["days"].dtype.kind == "i"
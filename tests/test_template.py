@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Frozen initial population, cloned for replicates'''
+
+
+from numpy import memmap as npmemmap
+from PathPandem.compose_pop import compose_homogenous
+from PathPandem.simul import simulate
+from PathPandem.template import freeze, load_template
+from scenario import small_scenario
+
+
+def simulated(city, simul_pop: int, simul_kw: dict):
+    '''Track of city, simulated till the epidemic ends'''
+    return simulate(city=city, logfile=None, simul_pop=simul_pop,
+                    **dict(simul_kw, max_days=None)).track
+
+
+def test_clone_simulates_as_composed(tmp_path):
+    compose_kw, simul_kw = small_scenario()
+    city, simul_pop, _, _ = compose_homogenous(seed=1, **compose_kw)
+    freeze(city).save(str(tmp_path))
+    template = load_template(str(tmp_path))
+    assert all(isinstance(column, npmemmap)
+               for column in template.columns.values())
+    frozen = {name: column.copy()
+              for name, column in template.columns.items()}
+    for seed in (4, 5):
+        composed, _, _, _ = compose_homogenous(seed=seed, **compose_kw)
+        clone = template.clone(seed)
+        assert (clone.home == composed.home).all()
+        expected = simulated(composed, simul_pop, simul_kw)
+        assert simulated(clone, simul_pop, simul_kw).tolist()\
+            == expected.tolist()
+    for name, column in template.columns.items():
+        assert not column.flags.writeable
+        assert (column == frozen[name]).all(), name
+    assert (load_template(str(tmp_path)).columns["health"]
+            == frozen["health"]).all()
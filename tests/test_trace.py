@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Trace of infection events'''
+
+
+from PathPandem.trace import read_trace, INFECTION
+from scenario import small_simulation, interrupted
+
+
+def test_resumed_trace_continues(tmp_path):
+    whole = str(tmp_path / "whole.trace")
+    small_simulation(8, trace=whole).run()
+    parts = str(tmp_path / "parts.trace")
+    interrupted(str(tmp_path / "checkpoint.npz"), 8, trace=parts,
+                resumed_kw={"trace": parts})
+    expected, resumed = read_trace(whole), read_trace(parts)
+    assert (expected["event"] == INFECTION).any()
+    assert expected.tolist() == resumed.tolist()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+'''Queue of vaccine doses'''
+
+
+from PathPandem.compose_pop import compose_homogenous
+from scenario import small_scenario
+
+
+def test_removal_keeps_dose_order():
+    compose_kw, _ = small_scenario()
+    city, _, _, _ = compose_homogenous(seed=2, **compose_kw)
+    city.start_vaccination(vac_resist=1., vac_cov=0.05,
+                           vac_priority="vulnerable")
+    schedule = city.vaccination
+    order = city.uid[schedule.queue].tolist()
+    feeble = city.comorbidity > 0
+    assert feeble.any()
+    assert feeble[schedule.queue[:feeble.sum()]].all()  # Comorbid first
+    city.vaccination.vaccinate(city)
+    assert schedule.head == 15 and city.vaccinated.sum() == 15
+    # A vaccinated person and three waiting in mid-queue leave
+    waiting = order[schedule.head:]
+    removed = [order[3], waiting[40], waiting[41], waiting[100]]
+    city - [city.uid.tolist().index(uid) for uid in removed]
+    expected = [uid for uid in waiting if uid not in removed]
+    assert city.uid[schedule.queue[schedule.head:]].tolist() == expected
+    # 5% of 296 persons a day: 14.8 doses, fractions carried over
+    start = 0
+    for doses in (14, 15, 15):
+        dosed = city.uid[city.vaccinated].tolist()
+        city.vaccination.vaccinate(city)
+        new = set(city.uid[city.vaccinated].tolist()) - set(dosed)
+        assert new == set(expected[start:start + doses])
+        start += doses
+    assert city.vaccinated.sum() == 14 + start
+    assert (city.susceptible[city.vaccinated] == 0).all()